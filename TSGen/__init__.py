@@ -4,6 +4,16 @@ __all__ = [
     "evo",
     "tsdetect",
     "llm_refactor",
+    "llm_client",
+    "llm_batch",
+    "llm_cache",
+    "metrics",
     "compiler",
+    "buildlog",
+    "javasrc",
+    "patches",
+    "tokens",
+    "checkpoint",
     "pipeline",
+    "batch",
 ]
\ No newline at end of file
@@ -0,0 +1,194 @@
+from __future__ import annotations
+import fnmatch
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from .config import ProjectConfig
+from .pipeline import run_pipeline
+from .utils import CommandError, run_cmd, set_cpu_budget
+
+# ── 프로젝트 목록 확장 (이름 / glob) ─────────────────────────────────────
+def expand_projects(patterns: List[str], root_experiment: Path | None = None) -> List[str]:
+    """Resolve project names and globs (e.g. "*", "cal*") against experiment/."""
+    root = root_experiment or ProjectConfig("_").root_experiment
+    available = sorted(p.name for p in root.iterdir() if p.is_dir()) if root.is_dir() else []
+    projects: List[str] = []
+    for pat in patterns:
+        if any(c in pat for c in "*?["):
+            matches = fnmatch.filter(available, pat)
+        else:
+            matches = [pat] if pat in available else []
+        if not matches:
+            print(f"[Batch] WARNING: no project matches {pat!r}")
+        projects.extend(m for m in matches if m not in projects)
+    return projects
+
+# ── 프로젝트별 출력 구분 ─────────────────────────────────────────────────
+class _ProjectOutput:
+    """
+    sys.stdout/stderr wrapper that prefixes each line with "[<project>] ".
+    A thread's project is the first "/"-separated part of its name: each
+    project runs on a thread named after it, and the pipeline's worker
+    threads extend the name of the thread that started them.
+    """
+
+    def __init__(self, stream, projects: List[str]):
+        self._stream = stream
+        self._projects = set(projects)
+        self._lock = threading.Lock()
+        self._partial: Dict[int, str] = {}      # thread ident → unfinished line
+
+    def write(self, text: str) -> int:
+        project = threading.current_thread().name.split("/")[0]
+        if project not in self._projects:
+            with self._lock:
+                return self._stream.write(text)
+        ident = threading.get_ident()
+        *lines, rest = (self._partial.pop(ident, "") + text).split("\n")
+        if rest:
+            self._partial[ident] = rest
+        if lines:
+            with self._lock:
+                self._stream.write("".join(f"[{project}] {line}\n" for line in lines))
+        return len(text)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._stream.flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+# ── 커버리지 단계 ────────────────────────────────────────────────────────
+_COVERAGE_RUNNER = Path(__file__).with_name("coverage_runner.py")
+_BUILDS = {"success", "stopped", "max_rounds"}  # pipeline results whose tests compile
+
+def _test_classes(cfg: ProjectConfig) -> List[str]:
+    """FQCNs of the classes under test, from the generated *_ESTest.java files."""
+    root = cfg.generated_test_dir
+    return sorted(".".join(f.relative_to(root).with_name(f.name.removesuffix("_ESTest.java")).parts)
+                  for f in root.rglob("*_ESTest.java"))
+
+def _run_coverage(project: str) -> Dict[str, object]:
+    """
+    Baseline vs refactored coverage for one project (coverage_runner.py
+    --compare). It runs as one external command, i.e. one CPU-budget slot.
+    """
+    cfg = ProjectConfig(project)
+    classes = _test_classes(cfg)
+    if not classes:
+        return {"status": "skipped"}
+    log = cfg.logs_dir / "coverage_runner.log"
+    try:
+        run_cmd([sys.executable, str(_COVERAGE_RUNNER), "--project", project, "--compare",
+                 "--classes", *classes], log_file=log, tail_lines=200)
+        status = "ok"
+    except CommandError as e:
+        print(f"[Batch] {project}: coverage failed (exit {_exit_code(e)}); see {log}")
+        status = "failed"
+    return {"status": status, "log": str(log)}
+
+def _exit_code(e: CommandError) -> int | None:
+    return e.result.returncode if e.result is not None else None
+
+# ── 멀티 프로젝트 실행 ───────────────────────────────────────────────────
+def run_batch(projects: List[str], cpu_budget: int | None = None,
+              max_projects: int | None = None, coverage: bool = True,
+              **pipeline_kwargs) -> Path:
+    """
+    Run the pipeline for several projects at once.
+
+    Projects run concurrently; every external command (EvoSuite, builds,
+    tsDetect, JUnit, coverage) takes a slot from one global CPU budget, while
+    LLM calls take none, so one project's LLM round overlaps another's
+    compilation. With `coverage`, a project whose pipeline ends with a
+    building suite then gets a baseline vs refactored coverage run.
+    Output lines are prefixed with their project.
+    Writes and returns results/index.json.
+    """
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    max_projects = max_projects or len(projects)
+    set_cpu_budget(cpu_budget)
+    print(f"[Batch] {len(projects)} projects, CPU budget {cpu_budget}, "
+          f"{max_projects} concurrent")
+
+    def _one(project: str) -> Dict[str, object]:
+        threading.current_thread().name = project
+        start = time.perf_counter()
+        try:
+            result = run_pipeline(project, **pipeline_kwargs)
+            if coverage and result["status"] in _BUILDS:
+                result["coverage"] = _run_coverage(project)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"project": project, "status": "error", "error": repr(e)}
+        result["elapsed_s"] = round(time.perf_counter() - start, 1)
+        print(f"[Batch] {project}: {result['status']} in {result['elapsed_s']}s")
+        return result
+
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = _ProjectOutput(stdout, projects), _ProjectOutput(stderr, projects)
+    try:
+        with ThreadPoolExecutor(max_workers=max_projects, thread_name_prefix="project") as pool:
+            results = list(pool.map(_one, projects))
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        set_cpu_budget(None)
+
+    index_path = ProjectConfig(projects[0]).root_results / "index.json"
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    index_path.write_text(json.dumps({
+        "generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "cpu_budget": cpu_budget,
+        "projects": {r["project"]: r for r in results},
+    }, indent=2), encoding="utf-8")
+
+    print("\n[Batch] Results")
+    for r in results:
+        files = r.get("files", {})
+        clean = sum(f["status"] == "clean" for f in files.values())
+        cov = r.get("coverage", {}).get("status", "-")
+        print(f"    {r['project']:<20} {r['status']:<15} rounds={r.get('rounds', '-')} "
+              f"clean={clean}/{len(files)}  coverage={cov}  {r['elapsed_s']}s")
+    print(f"[Batch] Index → {index_path}")
+    return index_path
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="TSGen multi-project batch runner")
+    parser.add_argument("projects", nargs="+",
+                        help="Project names or globs under experiment/ (e.g. '*')")
+    parser.add_argument("--cpu", type=int, default=None,
+                        help="Global budget of concurrent external commands (default: CPU count)")
+    parser.add_argument("--max-projects", type=int, default=None,
+                        help="Projects in flight at once (default: all)")
+    parser.add_argument(
+        "--llm-cache", choices=("use", "refresh", "off"), default="use",
+        help="LLM response cache mode (see pipeline).")
+    parser.add_argument("-j", "--evosuite-workers", type=int, default=1,
+                        help="Concurrent EvoSuite JVMs per project.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume each project from its checkpoint.")
+    parser.add_argument("--llm-backend", choices=("sync", "batch"), default="sync",
+                        help="batch: submit each round as one Batch API job (overnight runs).")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream files through detect → LLM → compile (see pipeline).")
+    parser.add_argument("--no-coverage", action="store_true",
+                        help="Skip the per-project baseline vs refactored coverage run.")
+    args = parser.parse_args()
+    if args.stream and args.llm_backend == "batch":
+        parser.error("--stream cannot be combined with --llm-backend batch")
+    projects = expand_projects(args.projects)
+    if not projects:
+        parser.error("no projects selected")
+    run_batch(projects, cpu_budget=args.cpu, max_projects=args.max_projects,
+              coverage=not args.no_coverage, llm_cache_mode=args.llm_cache, evosuite_workers=args.evosuite_workers,
+              resume=args.resume, streaming=args.stream, llm_backend=args.llm_backend)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+# ── diagnostic line formats ─────────────────────────────────────────────
+# javac / Gradle:  /abs/Foo_ESTest.java:42: error: cannot find symbol
+# Ant:                 [javac] /abs/Foo_ESTest.java:42: error: cannot find symbol
+# Maven:           [ERROR] /abs/Foo_ESTest.java:[42,17] cannot find symbol
+_PREFIX_RE = re.compile(r"^\s*(?:\[javac\]\s?|\[(?P<mvn>ERROR|WARNING)\]\s+)?")
+_JAVAC_RE = re.compile(
+    r"^(?P<path>\S.*?\.java):(?P<line>\d+):\s+(?:(?P<sev>error|warning):\s+)?(?P<msg>.*)$")
+_MAVEN_RE = re.compile(
+    r"^(?P<path>\S.*?\.java):\[(?P<line>\d+),(?P<col>\d+)\]\s+(?P<msg>.*)$")
+# javac's follow-up lines worth keeping (the source/caret lines are rebuilt from the file)
+_DETAIL_RE = re.compile(r"^\s*(symbol|location|required|found|reason|where)\b.*:")
+
+@dataclass
+class Diagnostic:
+    path: str
+    line: int
+    column: int | None
+    severity: str                 # "error" | "warning"
+    message: str
+    detail: List[str] = field(default_factory=list)
+
+def parse_build_log(text: str) -> Dict[str, List[Diagnostic]]:
+    """
+    Split javac/Ant/Maven/Gradle output into diagnostics grouped by file path
+    (as printed by the tool). Unrecognised lines are ignored.
+    """
+    diags: Dict[str, List[Diagnostic]] = {}
+    current: Diagnostic | None = None
+    for raw in text.splitlines():
+        prefix = _PREFIX_RE.match(raw)
+        body = raw[prefix.end():]
+        m = _MAVEN_RE.match(body) if prefix.group("mvn") else None
+        if m:
+            sev = prefix.group("mvn").lower()
+            current = Diagnostic(m["path"], int(m["line"]), int(m["col"]), sev, m["msg"].strip())
+        else:
+            m = _JAVAC_RE.match(body)
+            if m:
+                current = Diagnostic(m["path"], int(m["line"]), None,
+                                     m["sev"] or "error", m["msg"].strip())
+        if m:
+            diags.setdefault(current.path, []).append(current)
+            continue
+        if current is not None and _DETAIL_RE.match(body):
+            current.detail.append(body.strip())
+    return diags
+
+def diagnostics_for(diags: Dict[str, List[Diagnostic]], src_file: Path,
+                    root: Path, errors_only: bool = True) -> List[Diagnostic]:
+    """Diagnostics that belong to `src_file` (matched by absolute or root-relative path)."""
+    target = src_file.resolve()
+    rel = src_file.relative_to(root).as_posix()
+    found: List[Diagnostic] = []
+    for path, items in diags.items():
+        norm = path.replace("\\", "/")
+        if Path(path).resolve() == target or norm.endswith("/" + rel) or norm == rel:
+            found.extend(d for d in items if not errors_only or d.severity == "error")
+    return sorted(found, key=lambda d: d.line)
+
+def format_diagnostics(diags: List[Diagnostic], source: str, context: int = 2) -> str:
+    """Render diagnostics compactly, each followed by the surrounding source lines."""
+    lines = source.splitlines()
+    width = len(str(len(lines)))
+    out: List[str] = []
+    seen: set[tuple[int, str]] = set()
+    for d in diags:
+        if (d.line, d.message) in seen:
+            continue
+        seen.add((d.line, d.message))
+        col = f":{d.column}" if d.column else ""
+        out.append(f"Line {d.line}{col}: {d.severity}: {d.message}")
+        out.extend(f"  {x}" for x in d.detail)
+        lo, hi = max(1, d.line - context), min(len(lines), d.line + context)
+        for n in range(lo, hi + 1):
+            mark = ">" if n == d.line else " "
+            out.append(f"  {mark} {n:>{width}} | {lines[n - 1]}")
+        out.append("")
+    return "\n".join(out).rstrip()
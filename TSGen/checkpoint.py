@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from .config import ProjectConfig
+
+# Stages recorded once per run, in pipeline order
+GENERATED, BASELINE, DETECTED, VERIFIED = "generated", "baseline", "detected", "verified"
+
+class Checkpoint:
+    """
+    Pipeline progress persisted in result_dir/checkpoint.json.
+
+    The manifest is rewritten (atomically) after every stage and every
+    refactored file:
+
+        stages  – {"generated": ts, "baseline": ts, "detected": ts, "verified": ts}
+        files   – per-file FileState as of the last completed detection
+        round   – the open refactor round:
+                  {"n", "todo", "refactored", "refactor_done", "compiled"}
+                  or None once its smells were re-detected
+        rounds  – number of rounds started so far
+
+    Without `resume` any previous manifest is discarded.
+    """
+
+    def __init__(self, cfg: ProjectConfig, resume: bool = False,
+                 target_classes: List[str] | None = None):
+        self.path = cfg.result_dir / "checkpoint.json"
+        self._lock = threading.Lock()
+        targets = sorted(target_classes) if target_classes else None
+        data = self._load() if resume else None
+        if data is not None and data.get("target_classes") != targets:
+            print("[Checkpoint] Target classes differ from the checkpoint; starting fresh.")
+            data = None
+        if resume and data is None:
+            print(f"[Checkpoint] Nothing to resume at {self.path}; starting fresh.")
+        self.resumed = data is not None
+        self.data = data or {"target_classes": targets, "stages": {}, "files": {},
+                             "round": None, "rounds": 0}
+        self.save()
+
+    def _load(self) -> dict | None:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def save(self) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+    # ── once-per-run stages ──────────────────────────────────────────────
+    def done(self, stage: str) -> bool:
+        return stage in self.data["stages"]
+
+    def mark(self, stage: str) -> None:
+        self.data["stages"][stage] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.save()
+
+    def clear(self, stage: str) -> None:
+        if self.data["stages"].pop(stage, None) is not None:
+            self.save()
+
+    # ── per-file states ──────────────────────────────────────────────────
+    @property
+    def files(self) -> Dict[str, dict]:
+        return self.data["files"]
+
+    def set_files(self, files: Dict[str, dict]) -> None:
+        self.data["files"] = files
+        self.save()
+
+    # ── refactor rounds ──────────────────────────────────────────────────
+    @property
+    def rounds(self) -> int:
+        return self.data["rounds"]
+
+    @property
+    def open_round(self) -> dict | None:
+        return self.data["round"]
+
+    def begin_round(self, n: int, todo: List[str]) -> dict:
+        self.data["rounds"] = n
+        self.data["round"] = {"n": n, "todo": sorted(todo), "refactored": [],
+                              "refactor_done": False, "compiled": False}
+        self.save()
+        return self.data["round"]
+
+    def file_refactored(self, src_file: Path) -> None:
+        rnd = self.data["round"]
+        if rnd is not None and src_file.name not in rnd["refactored"]:
+            rnd["refactored"].append(src_file.name)
+            self.save()
+
+    def round_step(self, step: str, files: Dict[str, dict] | None = None) -> None:
+        """Mark `refactor_done` / `compiled` for the open round (with updated file states)."""
+        self.data["round"][step] = True
+        if files is not None:
+            self.data["files"] = files
+        self.save()
+
+    def close_round(self, files: Dict[str, dict]) -> None:
+        self.data["round"] = None
+        self.data["files"] = files
+        self.save()
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import re
 import shutil
 from pathlib import Path
 import os
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
+from . import metrics
 from .config import ProjectConfig
 from .utils import run_cmd, CommandError
 
@@ -18,22 +20,31 @@ def _detect_build_tool(project_dir: Path) -> str:
         return "gradle"
     return "maven"
 
-def _copy_refactored_tests(cfg: ProjectConfig) -> None:
+def _copy_refactored_tests(cfg: ProjectConfig, only: List[Path] | None = None) -> None:
+    """Copy refactored tests over the generated ones (only the counterparts of `only`, if given)."""
     if not cfg.refactored_test_dir.exists():
         return
 
     dst_root = cfg.generated_test_dir
-    for src in cfg.refactored_test_dir.rglob("*.java"):
+    if only is None:
+        sources = cfg.refactored_test_dir.rglob("*.java")
+    else:
+        gen_root = dst_root.resolve()
+        sources = [cfg.refactored_test_dir / f.resolve().relative_to(gen_root) for f in only]
+        sources = [src for src in sources if src.is_file()]
+    for src in sources:
         rel = src.relative_to(cfg.refactored_test_dir)  # preserve sub‑package path
         dst = dst_root / rel
         dst.parent.mkdir(parents=True, exist_ok=True)
         shutil.copy2(src, dst)
 
-def compile_and_test(cfg: ProjectConfig) -> Tuple[bool, Optional[str]]:
+def compile_and_test(cfg: ProjectConfig, only: List[Path] | None = None
+                     ) -> Tuple[bool, Optional[str]]:
     """
     clean → compile/test, return (success, error_output)
+    `only` limits which refactored tests are copied in first (default: all).
     """
-    _copy_refactored_tests(cfg)
+    _copy_refactored_tests(cfg, only)
     tool = _detect_build_tool(cfg.project_dir)
 
     if tool == "ant":
@@ -43,10 +54,99 @@ def compile_and_test(cfg: ProjectConfig) -> Tuple[bool, Optional[str]]:
     else:
         cmd = ["mvn", "-q", "clean", "test"]
 
-    try:
-        run_cmd(cmd, cwd=cfg.project_dir)
-        print(f"[Compile] {tool} build OK")
-        return True, None
-    except CommandError as e:
-        print(f"[Compile] {tool} build FAILED\n", e)
-        return False, str(e)
\ No newline at end of file
+    with metrics.span(cfg, "compile.full", tool=tool) as m:
+        try:
+            run_cmd(cmd, cwd=cfg.project_dir, timeout=cfg.build_timeout or None,
+                    log_file=cfg.logs_dir / "build.log")
+            m["exit_code"] = 0
+            print(f"[Compile] {tool} build OK")
+            return True, None
+        except CommandError as e:
+            m["exit_code"] = _exit_code(e)
+            print(f"[Compile] {tool} build FAILED\n", e)
+            return False, str(e)
+
+def _exit_code(e: CommandError) -> int | None:
+    return e.result.returncode if e.result is not None else None
+
+# ── fast verify: javac + JUnitCore on changed test classes only ─────────
+_JUNIT_FAILURE_RE = re.compile(r"^\d+\) .*?\(([\w.$]+)\)\s*$", re.M)
+
+def _classes_dir_candidates(cfg: ProjectConfig, tool: str) -> List[Path]:
+    if tool == "ant":
+        return [cfg.project_dir / "build" / "classes",
+                cfg.project_dir / "build",
+                cfg.project_dir / "temp" / "staging"]
+    if tool == "gradle":
+        return [cfg.project_dir / "build" / "classes" / "java" / "main"]
+    return [cfg.project_dir / "target" / "classes"]
+
+def _production_classes_dir(cfg: ProjectConfig) -> Path | None:
+    """Already-built production classes, or None if the project was never compiled."""
+    tool = _detect_build_tool(cfg.project_dir)
+    for d in _classes_dir_candidates(cfg, tool):
+        if d.is_dir() and any(d.rglob("*.class")):
+            return d.resolve()
+    return None
+
+def _test_classpath(cfg: ProjectConfig, prod_dir: Path, test_out: Path) -> str:
+    entries = [test_out, prod_dir]
+    lib = cfg.project_dir / "lib"
+    if lib.is_dir():
+        entries += sorted(p.resolve() for p in lib.glob("*.jar"))
+    entries.append(cfg.evosuite_jar.resolve())     # EvoSuite runtime for scaffolding
+    return os.pathsep.join(str(e) for e in entries)
+
+def fast_verify(cfg: ProjectConfig, changed: List[Path]
+                ) -> Tuple[bool, Optional[str], Dict[str, bool]]:
+    """
+    Compile only `changed` test sources with javac against the cached
+    production classes, then run just those classes in one JUnitCore JVM.
+    Returns (compiled, error_output, {test_class: passed}). As with the full
+    build, failing tests are reported but do not fail verification.
+    Falls back to `compile_and_test` when no production classes are cached.
+    """
+    _copy_refactored_tests(cfg, changed)
+    prod_dir = _production_classes_dir(cfg)
+    if prod_dir is None:
+        print("[Compile] No cached production classes; running full build.")
+        success, error_output = compile_and_test(cfg, changed)
+        return success, error_output, {}
+
+    test_root = cfg.generated_test_dir
+    sources = [f.resolve() for f in changed if f.is_file()]
+    if not sources:
+        return True, None, {}
+    test_out = (cfg.result_dir / "fast_verify" / "classes").resolve()
+    test_out.mkdir(parents=True, exist_ok=True)
+    cp = _test_classpath(cfg, prod_dir, test_out)
+
+    with metrics.span(cfg, "compile.fast", files=len(sources)) as m:
+        try:
+            run_cmd(["javac", "-nowarn", "-encoding", "UTF-8", "-d", str(test_out),
+                     "-cp", cp, "-sourcepath", str(test_root.resolve()),
+                     *map(str, sources)], cwd=cfg.project_dir,
+                    timeout=cfg.build_timeout or None, log_file=cfg.logs_dir / "build.log")
+            m["exit_code"] = 0
+        except CommandError as e:
+            m["exit_code"] = _exit_code(e)
+            print(f"[Compile] javac FAILED for {len(sources)} changed test file(s)\n", e)
+            return False, str(e), {}
+    print(f"[Compile] javac OK ({len(sources)} changed test file(s))")
+
+    classes = [".".join(f.relative_to(test_root.resolve()).with_suffix("").parts)
+               for f in sources]
+    with metrics.span(cfg, "junit.fast", classes=len(classes)) as m:
+        try:
+            output = run_cmd(["java", "-cp", cp, "org.junit.runner.JUnitCore", *classes],
+                             cwd=cfg.project_dir, timeout=cfg.test_timeout or None,
+                             log_file=cfg.logs_dir / "fast_verify.log")
+            m["exit_code"] = 0
+        except CommandError as e:
+            m["exit_code"] = _exit_code(e)
+            output = str(e)
+    failed = set(_JUNIT_FAILURE_RE.findall(output))
+    results = {c: c not in failed for c in classes}
+    for c, ok in results.items():
+        print(f"    {c}: {'passed' if ok else 'FAILED'}")
+    return True, None, results
@@ -21,14 +21,44 @@ class ProjectConfig:
     # JaCoCo locations
     jacoco_agent: Path = Path("tools/lib/jacocoagent.jar").resolve()
     jacoco_cli: Path = Path("tools/lib/jacococli.jar").resolve()
+    coverage_shards: int = 1               # parallel JUnit JVMs in coverage_runner
+
+    # EvoSuite
+    evosuite_workers: int = 1              # concurrent EvoSuite JVMs (>1 → one JVM per class)
+    evosuite_heap_mb: int = 0              # EvoSuite -mem (0 = EvoSuite default)
+    evosuite_search_budget: int = 0        # -Dsearch_budget seconds (0 = EvoSuite default)
+    evosuite_timeout: int = 0              # wall-clock seconds per EvoSuite JVM (0 = none)
+    evosuite_retries: int = 1              # retries per failed/timed-out class
+    evosuite_incremental: bool = True      # reuse tests of classes whose bytecode is unchanged
 
     # LLM
     openai_model: str = "o3"
     temperature: float = 0.2
+    openai_base_url: str | None = None     # OpenAI-compatible endpoint (None → SDK default)
+    llm_concurrency: int = 8               # parallel chat-completion requests
+    llm_requests_per_minute: int = 0       # 0 = unlimited
+    llm_tokens_per_minute: int = 0         # 0 = unlimited
+    llm_max_retries: int = 5               # on 429 / 5xx / connection errors
+    llm_backoff_base: float = 2.0          # seconds, doubled per retry (with jitter)
+    llm_cache_mode: str = "use"            # "use" | "refresh" | "off"
+    llm_cache_max_mb: int = 512            # LRU-evicted above this size
+    llm_chunk_tokens: int = 0              # split test classes into @Test groups of ~N tokens (0 = off)
+    llm_max_input_tokens: int = 0          # per-request prompt budget incl. system prompt (0 = none)
+    llm_edit_format: str = "whole"         # "whole" | "search_replace" | "udiff"
+    llm_backend: str = "sync"              # "sync" (chat completions) | "batch" (Batch API)
+    llm_batch_window: str = "24h"          # Batch API completion window
+    llm_batch_poll: int = 60               # seconds between batch status polls
+    llm_syntax_gate: bool = True           # parse LLM output in-process before any build
+    llm_regen_retries: int = 1             # re-asks per reply rejected by the gate / unappliable edits
 
     # pipeline limits
     max_refactor_rounds: int = 3
+    max_file_failures: int = 2             # failed LLM/compile attempts before a file is given up
     max_compile_retries: int = 3
+    fast_verify: bool = True               # javac changed tests only; full build as final gate
+    build_timeout: int = 0                 # wall-clock seconds per build command (0 = none)
+    test_timeout: int = 0                  # wall-clock seconds per JUnit run (0 = none)
+    stream_queue_size: int = 8             # bounded detect→LLM and LLM→compile queues (--stream)
 
     # ───── convenience paths ─────
     @property
@@ -44,6 +74,21 @@ class ProjectConfig:
         # EvoSuite writes tests here via -Dbase_dir
         return self.project_dir / "src" / "test" / "java"
 
+    @property
+    def logs_dir(self) -> Path:
+        # streamed output of external tools (EvoSuite, builds, tsDetect, JUnit)
+        return self.result_dir / "logs"
+
+    @property
+    def evosuite_store_dir(self) -> Path:
+        # pristine EvoSuite output, restored for unchanged classes
+        return self.result_dir / "evosuite_tests"
+
+    @property
+    def llm_cache_dir(self) -> Path:
+        # shared by all projects so identical prompts replay across experiments
+        return self.root_results / "llm_cache"
+
     @property
     def refactored_test_dir(self) -> Path:
         return self.result_dir / "refactored_tests"
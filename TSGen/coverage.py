@@ -1,8 +1,14 @@
+from __future__ import annotations
 from pathlib import Path
 from utils import run_cmd, CommandError
 from config import ProjectConfig
+from metrics import span as metric_span
+import csv
+import json
 import re
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 
 _RUNWITH_RE = re.compile(r'^\s*@RunWith\s*\(\s*EvoRunner\.class\s*\)\s*$')
 _PARAM_RE   = re.compile(r'^\s*@EvoRunnerParameters\([^)]*\)\s*$')
@@ -31,16 +37,252 @@ def _toggle_evorunner(fpath: Path, disable: bool) -> None:
 def _compile_with_ant(cfg: ProjectConfig) -> None:
     """Compile the project using Ant, ensuring test classes are built."""
     print("[Ant] Compile classes ...")
-    run_cmd("ant -q clean compile",       cwd=cfg.project_dir)
-    run_cmd("ant -q clean compile-tests", cwd=cfg.project_dir)
+    log = cfg.logs_dir / "build.log"
+    timeout = cfg.build_timeout or None
+    with metric_span(cfg, "coverage.compile"):
+        run_cmd(["ant", "-q", "clean", "compile"],       cwd=cfg.project_dir, timeout=timeout, log_file=log)
+        run_cmd(["ant", "-q", "clean", "compile-tests"], cwd=cfg.project_dir, timeout=timeout, log_file=log)
 
 
-def measure(class_fqcn: str, work_dir: Path, cfg: ProjectConfig) -> Path:
+def _package(class_fqcn: str) -> str:
+    return ".".join(class_fqcn.split(".")[:-1])
+
+
+def _junit_classpath(cfg: ProjectConfig, test_dir: Path | None = None) -> str:
+    proj_lib = (cfg.project_dir / "lib").resolve().as_posix() + "/*"
+    test_dir = (test_dir or cfg.test_classes_dir).resolve().as_posix()
+    proj_dir = cfg.prod_classes_dir.resolve().as_posix()
+    return f"{proj_lib}:{test_dir}:{proj_dir}"
+
+
+# JUnitCore wrapper that runs the test classes one after another in the same
+# JVM and writes "<class>\t<seconds>" per class to -Dtsgen.times
+_TIMED_RUNNER = "TSGenTimedJUnitCore"
+_TIMED_RUNNER_SRC = """\
+import java.io.FileWriter;
+import java.io.PrintWriter;
+import org.junit.internal.TextListener;
+import org.junit.runner.JUnitCore;
+import org.junit.runner.Result;
+
+public class TSGenTimedJUnitCore {
+    public static void main(String[] args) throws Exception {
+        JUnitCore core = new JUnitCore();
+        core.addListener(new TextListener(System.out));
+        boolean ok = true;
+        try (PrintWriter times = new PrintWriter(new FileWriter(System.getProperty("tsgen.times")))) {
+            for (String name : args) {
+                long start = System.nanoTime();
+                try {
+                    ok &= core.run(Class.forName(name)).wasSuccessful();
+                } catch (ClassNotFoundException e) {
+                    System.out.println("Could not find class: " + name);
+                    ok = false;
+                }
+                times.println(name + "\\t" + (System.nanoTime() - start) / 1e9);
+                times.flush();
+            }
+        }
+        System.exit(ok ? 0 : 1);
+    }
+}
+"""
+
+
+def _timed_runner_dir(cfg: ProjectConfig) -> Path:
+    return (cfg.result_dir / "coverage" / "timed_runner").resolve()
+
+
+def _compile_timed_runner(cfg: ProjectConfig) -> bool:
+    """javac the per-class timing runner once; False if that is not possible."""
+    out = _timed_runner_dir(cfg)
+    src = out / f"{_TIMED_RUNNER}.java"
+    if (out / f"{_TIMED_RUNNER}.class").is_file() and src.is_file() \
+            and src.read_text(encoding="utf-8") == _TIMED_RUNNER_SRC:
+        return True
+    out.mkdir(parents=True, exist_ok=True)
+    src.write_text(_TIMED_RUNNER_SRC, encoding="utf-8")
+    try:
+        run_cmd(["javac", "-nowarn", "-d", str(out), "-cp", _junit_classpath(cfg), str(src)],
+                cwd=cfg.project_dir, log_file=cfg.logs_dir / "build.log")
+        return True
+    except CommandError as e:
+        print(f"[Coverage] WARNING: cannot compile the timing runner; "
+              f"shard balancing keeps its old runtimes ({e})")
+        return False
+
+
+def _run_junit(cfg: ProjectConfig, test_classes: list[str], exec_file: Path,
+               includes: list[str], test_dir: Path | None = None,
+               times_file: Path | None = None) -> None:
+    """
+    Run `test_classes` in one JUnitCore JVM with the JaCoCo agent attached.
+    With `times_file`, the timing runner (see `_compile_timed_runner`) is
+    used instead and writes each class's wall time there.
+    """
+    agent_opts = (
+       f"-javaagent:{cfg.jacoco_agent.resolve()}=destfile={exec_file},"
+       f"includes={':'.join(includes)}"
+    )
+    cp = _junit_classpath(cfg, test_dir)
+    main = ["org.junit.runner.JUnitCore"]
+    if times_file is not None:
+        cp = f"{_timed_runner_dir(cfg).as_posix()}:{cp}"
+        main = [f"-Dtsgen.times={times_file}", _TIMED_RUNNER]
+    with metric_span(cfg, "coverage.junit", classes=len(test_classes),
+                     file=test_classes[0] if len(test_classes) == 1 else None) as m:
+        try:
+            run_cmd(
+                ["java", agent_opts, "-cp", cp, *main, *test_classes],
+                cwd=cfg.project_dir, timeout=cfg.test_timeout or None,
+                log_file=cfg.logs_dir / "coverage_junit.log", tail_lines=200
+            )
+            m["exit_code"] = 0
+        except CommandError as e:
+            # JUnit reported test failures (non-zero exit). We log and continue so that
+            # JaCoCo data is still processed.
+            m["exit_code"] = e.result.returncode if e.result is not None else None
+            print(f"[WARN] Tests reported failures; continuing to collect coverage.")
+
+
+REPORT_FORMATS = ("xml", "csv", "html")
+
+
+def _normalize_formats(formats) -> tuple[str, ...]:
+    """Validate report formats; XML is always produced (summary/table are built from it)."""
+    if isinstance(formats, str):
+        formats = formats.split(",")
+    fmts = {f.strip().lower() for f in formats if f.strip()}
+    unknown = fmts - set(REPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown report format(s): {sorted(unknown)} (choose from {REPORT_FORMATS})")
+    fmts.add("xml")
+    return tuple(f for f in REPORT_FORMATS if f in fmts)
+
+
+def _classfiles_args(cfg: ProjectConfig, packages: list[str]) -> list[str]:
+    proj_dir = cfg.prod_classes_dir.resolve()
+    return [arg for pkg in sorted(set(packages))
+            for arg in ("--classfiles", str(proj_dir / Path(*pkg.split('.'))))]
+
+
+def _report(cfg: ProjectConfig, exec_file: Path, packages: list[str],
+            work_dir: Path, formats=("xml",)) -> Path:
+    """jacococli report over the given packages' class dirs in `formats` → XML path."""
+    formats = _normalize_formats(formats)
+    src_path = (cfg.project_dir / 'src').resolve()
+    xml_path = (work_dir / "coverage.xml").resolve()
+    outputs = ["--xml", str(xml_path)]
+    if "csv" in formats:
+        outputs += ["--csv", str((work_dir / 'coverage.csv').resolve())]
+    if "html" in formats:
+        outputs += ["--html", str((work_dir / 'coverage_html').resolve())]
+    with metric_span(cfg, "coverage.report", formats=",".join(formats)):
+        run_cmd(
+            ["java", "-jar", str(cfg.jacoco_cli),
+             "report", str(exec_file),
+             *_classfiles_args(cfg, packages),
+             "--sourcefiles", str(src_path),
+             *outputs],
+            cwd=cfg.project_dir
+        )
+    return xml_path
+
+
+def render_html(cfg: ProjectConfig, exec_file: Path, class_fqcns: list[str],
+                out_dir: Path | None = None) -> Path:
+    """Render the HTML report later from a stored jacoco.exec (default: next to it)."""
+    out_dir = (out_dir or exec_file.parent / "coverage_html").resolve()
+    packages = sorted({_package(c) for c in class_fqcns})
+    run_cmd(
+        ["java", "-jar", str(cfg.jacoco_cli),
+         "report", str(exec_file.resolve()),
+         *_classfiles_args(cfg, packages),
+         "--sourcefiles", str((cfg.project_dir / 'src').resolve()),
+         "--html", str(out_dir)],
+        cwd=cfg.project_dir
+    )
+    print(f"HTML report generated: {out_dir}")
+    return out_dir
+
+
+# ── streaming report parsing ─────────────────────────────────────────────
+COUNTERS = ("INSTRUCTION", "BRANCH", "LINE", "METHOD", "COMPLEXITY")
+
+
+def coverage_table(xml_path: Path) -> dict[str, dict[str, tuple[int, int]]]:
+    """
+    Stream a JaCoCo XML report once (iterparse, clearing elements as we go)
+    and return {fqcn: {counter_type: (missed, covered)}} for every class.
+    Only the class-level counters are kept, not the per-method ones.
+    """
+    table: dict[str, dict[str, tuple[int, int]]] = {}
+    stack: list[str] = []
+    current: dict[str, tuple[int, int]] | None = None
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if event == "start":
+            stack.append(elem.tag)
+            if elem.tag == "class":
+                current = table.setdefault(elem.get("name").replace("/", "."), {})
+            continue
+        stack.pop()
+        if elem.tag == "counter":
+            if stack and stack[-1] == "class" and current is not None:
+                current[elem.get("type")] = (int(elem.get("missed")), int(elem.get("covered")))
+        elif elem.tag in ("method", "class", "sourcefile", "package"):
+            elem.clear()
+    return table
+
+
+def write_coverage_table(table: dict[str, dict[str, tuple[int, int]]], path: Path) -> Path:
+    """One row per class, `<COUNTER>_missed` / `<COUNTER>_covered` columns."""
+    header = ["class"] + [f"{c}_{k}" for c in COUNTERS for k in ("missed", "covered")]
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for fqcn in sorted(table):
+            row = [fqcn]
+            for c in COUNTERS:
+                row.extend(table[fqcn].get(c, (0, 0)))
+            writer.writerow(row)
+    return path
+
+
+def _print_class_coverage(class_fqcn: str, counters: dict[str, tuple[int, int]] | None) -> None:
+    if counters is None:
+        print(f"[Coverage] WARNING: Class '{class_fqcn}' not found in report XML.")
+        return
+    instr = counters.get("INSTRUCTION")
+    branch = counters.get("BRANCH")
+    
+    if instr is not None:
+        missed, covered = instr
+        instr_cov = 100 * covered / (covered + missed)
+        print(f"[Coverage] {class_fqcn} -- Instructions: {instr_cov:.2f}% "
+              f"({covered}/{covered + missed})")
+    
+    if branch is not None:
+        b_mis, b_cov = branch
+        total_b = b_cov + b_mis
+        if total_b > 0:
+            branch_cov = 100 * b_cov / total_b
+            print(f"[Coverage] {class_fqcn} -- Branch:       {branch_cov:.2f}% "
+                  f"({b_cov}/{total_b})")
+        else:
+            print(f"[Coverage] {class_fqcn} -- Branch:       n/a (no branches)")
+
+
+CoverageTable = dict[str, dict[str, tuple[int, int]]]
+
+
+def measure(class_fqcn: str, work_dir: Path, cfg: ProjectConfig,
+            formats=("xml",)) -> tuple[Path, CoverageTable]:
+    """Measure one class in its own run; returns (report XML, its `coverage_table`)."""
     work_dir.mkdir(parents=True, exist_ok=True)
     exec_file = (work_dir / "jacoco.exec").resolve()
     
     # 1. Temporarily disable EvoRunner annotations in the test source
-    pkg = ".".join(class_fqcn.split(".")[:-1])
+    pkg = _package(class_fqcn)
     test_src_path = (
         cfg.project_dir / "src" / "test" / "java" / Path(*pkg.split(".")) / f"{class_fqcn.split('.')[-1]}_ESTest.java"
     )
@@ -49,77 +291,17 @@ def measure(class_fqcn: str, work_dir: Path, cfg: ProjectConfig) -> Path:
     # 2. Make sure classes are compiled
     _compile_with_ant(cfg)
     
-    # 3. JaCoCo agent option
-    package_pattern = ".".join(class_fqcn.split(".")[:-1]) + ".*"
-    agent_opts = (
-       f"-javaagent:{cfg.jacoco_agent.resolve()}=destfile={exec_file},"
-       f"includes={package_pattern}"
-    )
-
-    # 4. Run Test (JUnitCore)
-    test_class = f"{pkg}.{class_fqcn.split('.')[-1]}_ESTest"
-    proj_lib   = (cfg.project_dir / "lib").resolve().as_posix() + "/*"
-    test_dir   = cfg.test_classes_dir.resolve().as_posix()
-    proj_dir   = cfg.prod_classes_dir.resolve().as_posix()
-    cp         = f"{proj_lib}:{test_dir}:{proj_dir}"
-
-    try:
-        run_cmd(
-            f"java {agent_opts} -cp {cp} org.junit.runner.JUnitCore {test_class}",
-            cwd=cfg.project_dir
-        )
-    except CommandError as e:
-        # JUnit reported test failures (non-zero exit). We log and continue so that
-        # JaCoCo data is still processed.
-        print(f"[WARN] Tests reported failures; continuing to collect coverage.")
+    # 3-4. Run Test (JUnitCore) with the JaCoCo agent
+    _run_junit(cfg, [f"{class_fqcn}_ESTest"], exec_file, [pkg + ".*"])
 
     # 5. Generate JaCoCo report
-    cls_path = (proj_dir / Path(*class_fqcn.split('.')[:-1]))
-    src_path = (cfg.project_dir / 'src').resolve()
-    html_dir = (work_dir / "coverage_html").resolve()
-    xml_path = (work_dir / "coverage.xml").resolve()
-    run_cmd(
-        f"java -jar {cfg.jacoco_cli} "
-        f"report {exec_file} "
-        f"--classfiles {cls_path} "
-        f"--sourcefiles {src_path} "
-        f"--html {html_dir} "
-        f"--xml {xml_path}",
-        cwd=cfg.project_dir
-    )
+    xml_path = _report(cfg, exec_file, [pkg], work_dir, formats)
     
     # 6. Parse XML and print coverage for only the target class
+    table: CoverageTable = {}
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
-        # JaCoCo stores class names with slashes
-        class_slash = class_fqcn.replace('.', '/')
-        class_node = root.find(f".//class[@name='{class_slash}']")
-        
-        if class_node is None:
-            print(f"[Coverage] WARNING: Class '{class_fqcn}' not found in report XML.")
-        else:
-            instr = class_node.find("./counter[@type='INSTRUCTION']")
-            branch = class_node.find("./counter[@type='BRANCH']")
-            
-            if instr is not None:
-                covered = int(instr.get("covered"))
-                missed = int(instr.get("missed"))
-                instr_cov = 100 * covered / (covered + missed)
-                print(f"[Coverage] {class_fqcn} -- Instructions: {instr_cov:.2f}% "
-                      f"({covered}/{covered + missed})")
-            
-            if branch is not None:
-                b_cov = int(branch.get("covered"))
-                b_mis = int(branch.get("missed"))
-                total_b = b_cov + b_mis
-                if total_b > 0:
-                    branch_cov = 100 * b_cov / total_b
-                    print(f"[Coverage] {class_fqcn} -- Branch:       {branch_cov:.2f}% "
-                          f"({b_cov}/{total_b})")
-                else:
-                    print(f"[Coverage] {class_fqcn} -- Branch:       n/a (no branches)")
+        table = coverage_table(xml_path)
+        _print_class_coverage(class_fqcn, table.get(class_fqcn))
     except Exception as e:
         print(f"[Coverage] Failed to parse XML: {e}")
     
@@ -127,4 +309,113 @@ def measure(class_fqcn: str, work_dir: Path, cfg: ProjectConfig) -> Path:
     _toggle_evorunner(test_src_path, disable=False)
     print(f"Coverage report generated: {xml_path}")
     
-    return xml_path
\ No newline at end of file
+    return xml_path, table
+
+
+def _report_and_print(cfg: ProjectConfig, exec_file: Path, class_fqcns: list[str],
+                      work_dir: Path, formats=("xml",)) -> tuple[Path, CoverageTable]:
+    packages = sorted({_package(c) for c in class_fqcns})
+    xml_path = _report(cfg, exec_file, packages, work_dir, formats)
+    table: CoverageTable = {}
+    try:
+        table = coverage_table(xml_path)
+        for fqcn in class_fqcns:
+            _print_class_coverage(fqcn, table.get(fqcn))
+    except Exception as e:
+        print(f"[Coverage] Failed to parse XML: {e}")
+    print(f"Coverage report generated: {xml_path}")
+    return xml_path, table
+
+
+def measure_batch(class_fqcns: list[str], work_dir: Path, cfg: ProjectConfig,
+                  formats=("xml",)) -> tuple[Path, CoverageTable]:
+    """
+    Batch variant of `measure`: compile once, run every `<fqcn>_ESTest` in a
+    single instrumented JVM writing one jacoco.exec, generate one report and
+    read per-class numbers from that XML. Returns (report XML, its table).
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    exec_file = (work_dir / "jacoco.exec").resolve()
+    exec_file.unlink(missing_ok=True)          # the agent appends by default
+    packages = sorted({_package(c) for c in class_fqcns})
+
+    _compile_with_ant(cfg)
+    _run_junit(cfg, [f"{c}_ESTest" for c in class_fqcns], exec_file,
+               [p + ".*" for p in packages])
+    return _report_and_print(cfg, exec_file, class_fqcns, work_dir, formats)
+
+
+# ── sharded (parallel) collection ─────────────────────────────────────────
+def _runtimes_path(cfg: ProjectConfig) -> Path:
+    return cfg.result_dir / "coverage" / "class_runtimes.json"
+
+
+def _balance_shards(class_fqcns: list[str], n: int,
+                    runtimes: dict[str, float]) -> list[list[str]]:
+    """Longest-processing-time-first: heaviest class goes to the lightest shard."""
+    known = sorted(runtimes[c] for c in class_fqcns if c in runtimes)
+    default = known[len(known) // 2] if known else 1.0        # median of known runtimes
+    weight = {c: runtimes.get(c, default) for c in class_fqcns}
+    shards: list[list[str]] = [[] for _ in range(min(n, len(class_fqcns)))]
+    loads = [0.0] * len(shards)
+    for c in sorted(class_fqcns, key=lambda c: -weight[c]):
+        i = loads.index(min(loads))
+        shards[i].append(c)
+        loads[i] += weight[c]
+    return shards
+
+
+def measure_sharded(class_fqcns: list[str], work_dir: Path, cfg: ProjectConfig,
+                    shards: int, formats=("xml",)) -> tuple[Path, CoverageTable]:
+    """
+    Compile once, split the classes into `shards` runtime-balanced groups and
+    run each in its own instrumented JVM (own destfile) in parallel, then
+    `jacococli merge` the exec files and produce one report.
+    Returns (report XML, its table).
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        runtimes = json.loads(_runtimes_path(cfg).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        runtimes = {}
+    groups = _balance_shards(class_fqcns, shards, runtimes)
+
+    _compile_with_ant(cfg)
+    timed = _compile_timed_runner(cfg)
+
+    def _run_shard(idx: int) -> Path:
+        group = groups[idx]
+        exec_file = (work_dir / f"shard_{idx}" / "jacoco.exec").resolve()
+        exec_file.parent.mkdir(parents=True, exist_ok=True)
+        exec_file.unlink(missing_ok=True)
+        times_file = exec_file.with_name("class_times.tsv") if timed else None
+        if times_file is not None:
+            times_file.unlink(missing_ok=True)
+        packages = sorted({_package(c) for c in group})
+        start = time.perf_counter()
+        _run_junit(cfg, [f"{c}_ESTest" for c in group], exec_file,
+                   [p + ".*" for p in packages], times_file=times_file)
+        elapsed = time.perf_counter() - start
+        print(f"[Coverage] shard {idx}: {len(group)} classes in {elapsed:.1f}s")
+        # measured per-class runtimes for balancing the next run
+        if times_file is not None and times_file.is_file():
+            for line in times_file.read_text(encoding="utf-8").splitlines():
+                test_class, _, seconds = line.partition("\t")
+                runtimes[test_class.removesuffix("_ESTest")] = float(seconds)
+        return exec_file
+
+    print(f"[Coverage] Running {len(groups)} shards in parallel")
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        exec_files = list(pool.map(_run_shard, range(len(groups))))
+
+    merged = (work_dir / "jacoco.exec").resolve()
+    run_cmd(
+        ["java", "-jar", str(cfg.jacoco_cli), "merge",
+         *(str(e) for e in exec_files if e.is_file()),
+         "--destfile", str(merged)],
+        cwd=cfg.project_dir
+    )
+    _runtimes_path(cfg).parent.mkdir(parents=True, exist_ok=True)
+    _runtimes_path(cfg).write_text(json.dumps(runtimes, indent=2), encoding="utf-8")
+
+    return _report_and_print(cfg, merged, class_fqcns, work_dir, formats)
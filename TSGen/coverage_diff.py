@@ -0,0 +1,173 @@
+"""
+coverage_diff.py - Baseline (EvoSuite) vs refactored test-suite coverage comparison.
+
+The baseline suite is compiled from results/<project>/baseline_tests into its own
+class dir; its jacoco.exec is cached under results/<project>/coverage/baseline and
+only re-executed when the baseline sources, production classes or class list change.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from utils import run_cmd
+from config import ProjectConfig
+from coverage import (_compile_with_ant, _package, _report, _run_junit,
+                      coverage_table)
+
+DIFF_COUNTERS = ("INSTRUCTION", "BRANCH")
+
+
+def line_table(xml_path: Path) -> dict[str, dict[int, tuple[int, int, int, int]]]:
+    """Stream a JaCoCo XML report → {"pkg/File.java": {line: (mi, ci, mb, cb)}}."""
+    table: dict[str, dict[int, tuple[int, int, int, int]]] = {}
+    package = ""
+    current: dict[int, tuple[int, int, int, int]] | None = None
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "package":
+                package = elem.get("name")
+            elif elem.tag == "sourcefile":
+                current = table.setdefault(f"{package}/{elem.get('name')}", {})
+            continue
+        if elem.tag == "line" and current is not None:
+            current[int(elem.get("nr"))] = (int(elem.get("mi")), int(elem.get("ci")),
+                                            int(elem.get("mb")), int(elem.get("cb")))
+        elif elem.tag in ("sourcefile", "class", "package"):
+            elem.clear()
+    return table
+
+
+def _hash_tree(h, root: Path, suffix: str) -> None:
+    for f in sorted(root.rglob(f"*{suffix}")):
+        h.update(f.relative_to(root).as_posix().encode())
+        h.update(f.read_bytes())
+
+
+def _baseline_key(cfg: ProjectConfig, baseline_src: Path, class_fqcns: list[str]) -> str:
+    h = hashlib.sha256()
+    h.update(",".join(sorted(class_fqcns)).encode())
+    _hash_tree(h, baseline_src, ".java")
+    _hash_tree(h, cfg.prod_classes_dir, ".class")
+    return h.hexdigest()
+
+
+def _compile_suite(cfg: ProjectConfig, src_dir: Path, out_dir: Path) -> None:
+    """javac a standalone test tree against the already-built production classes."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cp = os.pathsep.join([
+        str((cfg.project_dir / "lib").resolve() / "*"),
+        str(cfg.prod_classes_dir.resolve()),
+        str(cfg.evosuite_jar.resolve()),
+    ])
+    sources = [str(f.resolve()) for f in src_dir.rglob("*.java")]
+    run_cmd(["javac", "-nowarn", "-encoding", "UTF-8", "-d", str(out_dir.resolve()),
+             "-cp", cp, *sources], cwd=cfg.project_dir,
+            timeout=cfg.build_timeout or None, log_file=cfg.logs_dir / "build.log")
+
+
+def _baseline_report(cfg: ProjectConfig, class_fqcns: list[str]) -> Path:
+    """Baseline XML report, re-running the baseline suite only when its cache key changed."""
+    baseline_src = cfg.result_dir / "baseline_tests"
+    if not baseline_src.is_dir():
+        raise FileNotFoundError(f"No baseline tests at {baseline_src}; run the pipeline first.")
+    work_dir = cfg.result_dir / "coverage" / "baseline"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    exec_file = (work_dir / "jacoco.exec").resolve()
+    key_file = work_dir / "cache_key.txt"
+    packages = sorted({_package(c) for c in class_fqcns})
+
+    key = _baseline_key(cfg, baseline_src, class_fqcns)
+    if exec_file.is_file() and key_file.is_file() and key_file.read_text() == key:
+        print("[Coverage] Baseline exec up to date; reusing cached jacoco.exec")
+    else:
+        print("[Coverage] Running baseline suite")
+        test_dir = work_dir / "test-classes"
+        _compile_suite(cfg, baseline_src, test_dir)
+        exec_file.unlink(missing_ok=True)
+        _run_junit(cfg, [f"{c}_ESTest" for c in class_fqcns], exec_file,
+                   [p + ".*" for p in packages], test_dir=test_dir)
+        key_file.write_text(key)
+    return _report(cfg, exec_file, packages, work_dir)
+
+
+def diff_reports(baseline_xml: Path, refactored_xml: Path, class_fqcns: list[str],
+                 refactored_table: dict | None = None) -> dict:
+    """
+    Per-class counter deltas and per-line coverage changes (baseline → refactored).
+    `refactored_table` is the already parsed `coverage_table(refactored_xml)`, if any.
+    """
+    base_cls = coverage_table(baseline_xml)
+    ref_cls = refactored_table if refactored_table is not None else coverage_table(refactored_xml)
+    base_lines, ref_lines = line_table(baseline_xml), line_table(refactored_xml)
+
+    classes: dict[str, dict] = {}
+    dropped: list[str] = []
+    for fqcn in class_fqcns:
+        entry: dict[str, dict] = {}
+        for counter in DIFF_COUNTERS:
+            b_miss, b_cov = base_cls.get(fqcn, {}).get(counter, (0, 0))
+            r_miss, r_cov = ref_cls.get(fqcn, {}).get(counter, (0, 0))
+            entry[counter.lower()] = {"baseline": b_cov, "refactored": r_cov,
+                                      "total": max(b_miss + b_cov, r_miss + r_cov),
+                                      "delta": r_cov - b_cov}
+        # JaCoCo keys source files by package path + file name (inner classes share it)
+        outer = fqcn.split("$")[0]
+        src = f"{_package(outer).replace('.', '/')}/{outer.split('.')[-1]}.java"
+        b_lines, r_lines = base_lines.get(src, {}), ref_lines.get(src, {})
+        lost, gained, lost_branches = [], [], []
+        for nr in sorted(set(b_lines) | set(r_lines)):
+            _, b_ci, _, b_cb = b_lines.get(nr, (0, 0, 0, 0))
+            _, r_ci, _, r_cb = r_lines.get(nr, (0, 0, 0, 0))
+            if b_ci and not r_ci:
+                lost.append(nr)
+            elif r_ci and not b_ci:
+                gained.append(nr)
+            if r_cb < b_cb:
+                lost_branches.append(nr)
+        entry["lines_lost"] = lost
+        entry["lines_gained"] = gained
+        entry["branch_lines_lost"] = lost_branches
+        entry["dropped"] = any(entry[c.lower()]["delta"] < 0 for c in DIFF_COUNTERS)
+        if entry["dropped"]:
+            dropped.append(fqcn)
+        classes[fqcn] = entry
+    return {"classes": classes, "dropped": dropped}
+
+
+def compare(cfg: ProjectConfig, class_fqcns: list[str], out_dir: Path) -> tuple[Path, dict]:
+    """
+    Measure the refactored suite (current src/test/java) and the cached
+    baseline suite, write coverage_diff.json into `out_dir` and return the
+    refactored XML path with its `coverage_table`.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    work_dir = out_dir / "refactored"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    exec_file = (work_dir / "jacoco.exec").resolve()
+    exec_file.unlink(missing_ok=True)
+    packages = sorted({_package(c) for c in class_fqcns})
+
+    _compile_with_ant(cfg)
+    _run_junit(cfg, [f"{c}_ESTest" for c in class_fqcns], exec_file,
+               [p + ".*" for p in packages])
+    refactored_xml = _report(cfg, exec_file, packages, work_dir)
+    baseline_xml = _baseline_report(cfg, class_fqcns)
+
+    refactored_table = coverage_table(refactored_xml)
+    result = diff_reports(baseline_xml, refactored_xml, class_fqcns, refactored_table)
+    (out_dir / "coverage_diff.json").write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    for fqcn, entry in result["classes"].items():
+        ins, br = entry["instruction"], entry["branch"]
+        flag = "  <-- DROPPED" if entry["dropped"] else ""
+        print(f"[Coverage] {fqcn}: instr {ins['baseline']}→{ins['refactored']} ({ins['delta']:+d}), "
+              f"branch {br['baseline']}→{br['refactored']} ({br['delta']:+d}){flag}")
+    if result["dropped"]:
+        print(f"[Coverage] {len(result['dropped'])} class(es) lost coverage after refactoring")
+    else:
+        print("[Coverage] Refactoring preserved coverage for all classes")
+    return refactored_xml, refactored_table
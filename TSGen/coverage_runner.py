@@ -3,6 +3,11 @@ coverage_runner.py - JaCoCo coverage measurement and report generation.
 
 $ python coverage_runner.py --project <project_name> 
 $ python coverage_runner.py --project <project_name> --classes com.foo.Bar com.foo.Baz
+$ python coverage_runner.py --project <project_name> --batch   # one JVM for all classes
+$ python coverage_runner.py --project <project_name> --shards 8 # 8 parallel JVMs, merged
+$ python coverage_runner.py --project <project_name> --report-format xml,html
+$ python coverage_runner.py --project <project_name> --render-html results/<project>/coverage/<run>
+$ python coverage_runner.py --project <project_name> --compare   # baseline vs refactored suite
 """
 
 from __future__ import annotations
@@ -11,7 +16,10 @@ import argparse, json, datetime, sys
 
 # Inner modules
 from config   import ProjectConfig
-from coverage import measure
+from coverage import (measure, measure_batch, measure_sharded, render_html,
+                      write_coverage_table)
+from coverage_diff import compare
+import metrics
 
 def parse_args() -> argparse.Namespace:
     ap = argparse.ArgumentParser(description="Run JaCoCo coverage for target classes.")
@@ -21,6 +29,18 @@ def parse_args() -> argparse.Namespace:
                     help="FQCNs to measure (space separated). If omitted, use config.target_classes")
     ap.add_argument("--round-tag", default=None,
                     help="Identifier to append after the resulting folder name(e.g., refactored)")
+    ap.add_argument("--batch", action="store_true",
+                    help="Compile once and measure all classes in one instrumented JVM / one report")
+    ap.add_argument("--shards", type=int, default=None,
+                    help="Run classes in N parallel JVMs and merge their exec files "
+                         "(implies --batch; default: config.coverage_shards)")
+    ap.add_argument("--report-format", default="xml",
+                    help="Comma-separated JaCoCo report formats: xml, csv, html (xml is always written)")
+    ap.add_argument("--compare", action="store_true",
+                    help="Measure baseline_tests and the refactored suite; write per-class/line deltas "
+                         "to coverage_diff.json and flag classes whose coverage dropped")
+    ap.add_argument("--render-html", metavar="RUN_DIR", default=None,
+                    help="Render HTML for an earlier coverage run from its stored jacoco.exec files and exit")
     return ap.parse_args()
 
 def main() -> None:
@@ -28,6 +48,16 @@ def main() -> None:
     
     cfg = ProjectConfig(project_name=args.project)
     cfg.ensure_dirs()
+
+    if args.render_html:
+        run_dir = Path(args.render_html)
+        summary = json.loads((run_dir / "summary.json").read_text(encoding="utf-8"))
+        by_xml: dict[str, list[str]] = {}
+        for fqcn, rel in summary.items():
+            by_xml.setdefault(rel, []).append(fqcn)
+        for rel, classes in by_xml.items():
+            render_html(cfg, (cfg.result_dir / rel).parent / "jacoco.exec", classes)
+        return
     
     target_classes = args.classes or getattr(cfg, "target_classes", [])
     if not target_classes:
@@ -40,19 +70,47 @@ def main() -> None:
     out_dir.mkdir(parents=True, exist_ok=True)
     
     print(f"Coverage for {len(target_classes)} classes → {out_dir}")
+    rec = metrics.start_run(cfg)
     
+    shards = args.shards or cfg.coverage_shards
     summary: dict[str, str] = {}
-    for fqcn in target_classes:
-        cls_dir       = out_dir / fqcn.replace(".", "_")
-        xml           = measure(fqcn, cls_dir, cfg)
-        summary[fqcn] = str(Path(xml).resolve().relative_to(cfg.result_dir.resolve()))
+    tables: dict[str, dict[str, dict[str, tuple[int, int]]]] = {}   # report → its table
+    if args.compare:
+        xml, t = compare(cfg, target_classes, out_dir)
+        rel = str(Path(xml).resolve().relative_to(cfg.result_dir.resolve()))
+        summary, tables[rel] = {fqcn: rel for fqcn in target_classes}, t
+    elif shards > 1 or args.batch:
+        if shards > 1:
+            xml, t = measure_sharded(target_classes, out_dir / "batch", cfg, shards,
+                                     args.report_format)
+        else:
+            xml, t = measure_batch(target_classes, out_dir / "batch", cfg, args.report_format)
+        rel = str(Path(xml).resolve().relative_to(cfg.result_dir.resolve()))
+        summary, tables[rel] = {fqcn: rel for fqcn in target_classes}, t
+    else:
+        for fqcn in target_classes:
+            cls_dir       = out_dir / fqcn.replace(".", "_")
+            xml, t        = measure(fqcn, cls_dir, cfg, args.report_format)
+            summary[fqcn] = str(Path(xml).resolve().relative_to(cfg.result_dir.resolve()))
+            tables[summary[fqcn]] = t
         
     # Save summary
     (out_dir / "summary.json").write_text(
         json.dumps(summary, indent=2), encoding="utf-8"
     )
+
+    # Compact per-class counter table from the tables the measure run already parsed
+    table: dict[str, dict[str, tuple[int, int]]] = {}
+    for t in tables.values():
+        table.update(t)
+    for fqcn, rel in summary.items():
+        # per-class mode: a class's own run is authoritative for its row
+        if fqcn in tables[rel]:
+            table[fqcn] = tables[rel][fqcn]
+    write_coverage_table(table, out_dir / "coverage_table.csv")
     
-    print("Done -- summary.json created")
+    rec.print_summary()
+    print("Done -- summary.json and coverage_table.csv created")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,10 +1,17 @@
 from __future__ import annotations
+import hashlib
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
+from . import metrics
 from .config import ProjectConfig
-from .utils import run_cmd
-from .compiler import _detect_build_tool
+from .utils import run_cmd, CommandError, CommandTimeout
+from .compiler import _detect_build_tool, _classes_dir_candidates
 
 # ── EvoSuite가 다루면 안 되는 루트 패키지 ────────────────────────────────
 SKIP_ROOTS = {"java", "javax", "jakarta", "sun", "com.sun", "org.junit"}
@@ -14,20 +21,15 @@ def _ensure_compiled(cfg: ProjectConfig) -> Path:
     tool = _detect_build_tool(cfg.project_dir)
 
     if tool == "ant":
-        run_cmd(["ant", "-q", "clean", "compile"], cwd=cfg.project_dir)
-        possible = [
-            cfg.project_dir / "build" / "classes",
-            cfg.project_dir / "build",
-            cfg.project_dir / "temp" / "staging",
-        ]
-        classes_dir = next((d for d in possible if d.is_dir()),
-                           cfg.project_dir / "build" / "classes")
+        cmd = ["ant", "-q", "clean", "compile"]
     elif tool == "gradle":
-        run_cmd(["gradle", "-q", "clean", "classes"], cwd=cfg.project_dir)
-        classes_dir = cfg.project_dir / "build" / "classes" / "java" / "main"
+        cmd = ["gradle", "-q", "clean", "classes"]
     else:                              # Maven
-        run_cmd(["mvn", "-q", "clean", "compile"], cwd=cfg.project_dir)
-        classes_dir = cfg.project_dir / "target" / "classes"
+        cmd = ["mvn", "-q", "clean", "compile"]
+    run_cmd(cmd, cwd=cfg.project_dir, timeout=cfg.build_timeout or None,
+            log_file=cfg.logs_dir / "build.log")
+    possible = _classes_dir_candidates(cfg, tool)
+    classes_dir = next((d for d in possible if d.is_dir()), possible[0])
 
     if classes_dir.is_dir():
         return classes_dir.resolve()
@@ -50,13 +52,149 @@ def _discover_target_classes(classes_dir: Path) -> List[str]:
     # JDK·프레임워크 루트 필터
     return [c for c in fqns if c.split(".")[0] not in SKIP_ROOTS]
 
+# ── EvoSuite 1회 실행 (이미 빌드된 classes_dir 공유) ─────────────────────
+def _run_evosuite(cfg: ProjectConfig, classes_dir: Path, classes: List[str],
+                  work_dir: Path | None = None) -> None:
+    cmd = [
+        "java", "-jar", str(cfg.evosuite_jar.resolve()),
+        "-class", ",".join(classes),
+        "-projectCP", str(classes_dir),
+        "-generateSuite",
+        "-Dtest_dir", str(cfg.generated_test_dir.resolve()),
+        "-seed", "42",
+        "-Djunit_check=true",
+    ]
+    if cfg.evosuite_heap_mb:
+        cmd += ["-mem", str(cfg.evosuite_heap_mb)]
+    if cfg.evosuite_search_budget:
+        cmd += [f"-Dsearch_budget={cfg.evosuite_search_budget}"]
+    # EvoSuite is chatty: stream everything to the log, keep only a tail in memory
+    with metrics.span(cfg, "evosuite.run", classes=len(classes),
+                      file=classes[0] if len(classes) == 1 else None) as m:
+        try:
+            run_cmd(cmd, cwd=work_dir or cfg.project_dir,
+                    timeout=cfg.evosuite_timeout or None,
+                    log_file=(work_dir or cfg.logs_dir) / "evosuite.log", tail_lines=200)
+            m["exit_code"] = 0
+        except CommandError as e:
+            m["exit_code"] = e.result.returncode if e.result is not None else None
+            m["status"] = "timeout" if isinstance(e, CommandTimeout) else "failed"
+            raise
+
+# ── 병렬 생성: 클래스 단위 샤딩 ─────────────────────────────────────────
+def _generate_parallel(cfg: ProjectConfig, classes_dir: Path,
+                       target_classes: List[str]) -> Dict[str, str]:
+    """
+    Run one EvoSuite JVM per class on `cfg.evosuite_workers` concurrent slots.
+    Each class gets its own working directory (EvoSuite writes
+    evosuite-report/ etc. into cwd); tests still land in generated_test_dir,
+    one file per class, so outputs never collide.
+    Returns {class: "ok" | "failed" | "timeout"}.
+    """
+    work_root = (cfg.result_dir / "evosuite_work").resolve()
+    total = len(target_classes)
+    done = 0
+    lock = threading.Lock()
+
+    def _one(cls: str) -> str:
+        nonlocal done
+        work_dir = work_root / cls
+        work_dir.mkdir(parents=True, exist_ok=True)
+        status = "failed"
+        for attempt in range(cfg.evosuite_retries + 1):
+            try:
+                _run_evosuite(cfg, classes_dir, [cls], work_dir=work_dir)
+                status = "ok"
+                break
+            except CommandTimeout:
+                status = "timeout"
+            except CommandError:
+                status = "failed"
+            if attempt < cfg.evosuite_retries:
+                print(f"[EvoSuite] {cls}: {status}, retry {attempt + 1}")
+        with lock:
+            done += 1
+            print(f"[EvoSuite]  ›  [{done}/{total}]  {cls}: {status}")
+        return status
+
+    # the JVMs are the worker processes; threads only wait on them
+    with ThreadPoolExecutor(max_workers=cfg.evosuite_workers,
+                            thread_name_prefix=f"{threading.current_thread().name}/evosuite") as pool:
+        return dict(zip(target_classes, pool.map(_one, target_classes)))
+
+# ── 증분 생성: 클래스 바이트코드 해시 manifest ───────────────────────────
+def _class_hash(classes_dir: Path, fqcn: str) -> str | None:
+    """sha256 over the class file and all of its inner/anonymous `$` classes."""
+    rel = Path(*fqcn.split("."))
+    outer = classes_dir / rel.with_suffix(".class")
+    if not outer.is_file():
+        return None
+    h = hashlib.sha256()
+    for f in [outer, *sorted(outer.parent.glob(f"{rel.name}$*.class"))]:
+        h.update(f.name.encode())
+        h.update(f.read_bytes())
+    return h.hexdigest()
+
+def _evosuite_params(cfg: ProjectConfig) -> str:
+    jar = cfg.evosuite_jar.resolve()
+    stat = jar.stat() if jar.is_file() else None
+    return json.dumps({
+        "jar": [jar.name, stat.st_size if stat else 0, int(stat.st_mtime) if stat else 0],
+        "seed": 42,
+        "junit_check": True,
+        "heap_mb": cfg.evosuite_heap_mb,
+        "search_budget": cfg.evosuite_search_budget,
+    }, sort_keys=True)
+
+def _test_files(root: Path, fqcn: str) -> List[Path]:
+    rel = Path(*fqcn.split("."))
+    return [root / rel.parent / f"{rel.name}_ESTest.java",
+            root / rel.parent / f"{rel.name}_ESTest_scaffolding.java"]
+
+def _manifest_path(cfg: ProjectConfig) -> Path:
+    return cfg.result_dir / "evosuite_manifest.json"
+
+def _load_manifest(cfg: ProjectConfig) -> dict:
+    try:
+        return json.loads(_manifest_path(cfg).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"params": None, "classes": {}}
+
+def _store_tests(cfg: ProjectConfig, fqcn: str) -> bool:
+    """Keep a pristine copy of the EvoSuite output (the pipeline later overwrites it)."""
+    produced = _test_files(cfg.generated_test_dir, fqcn)
+    if not all(f.is_file() for f in produced):
+        return False
+    for src, dst in zip(produced, _test_files(cfg.evosuite_store_dir, fqcn)):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dst)
+    return True
+
+def _output_stamps(cfg: ProjectConfig, fqcn: str) -> List[int | None]:
+    """mtimes (ns) of the class's generated test files, None where missing."""
+    return [f.stat().st_mtime_ns if f.is_file() else None
+            for f in _test_files(cfg.generated_test_dir, fqcn)]
+
+def _restore_tests(cfg: ProjectConfig, fqcn: str) -> bool:
+    stored = _test_files(cfg.evosuite_store_dir, fqcn)
+    if not all(f.is_file() for f in stored):
+        return False
+    for src, dst in zip(stored, _test_files(cfg.generated_test_dir, fqcn)):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dst)
+    return True
+
 # ── 메인 엔트리 ──────────────────────────────────────────────────────────
 def generate_tests(cfg: ProjectConfig,
                    target_classes: List[str] | None = None) -> None:
     print("[EvoSuite] Starting test generation...")
     cfg.ensure_dirs()
 
-    classes_dir = _ensure_compiled(cfg)
+    # compile + classpath discovery happen exactly once per run
+    t0 = time.perf_counter()
+    with metrics.span(cfg, "evosuite.compile"):
+        classes_dir = _ensure_compiled(cfg)
+    t_compile = time.perf_counter() - t0
     print(f"[EvoSuite] Using classpath: {classes_dir}")
 
     # ① 사용자가 -c 로 준 목록 → ② 클래스 디렉터리 자동 탐색
@@ -66,28 +204,77 @@ def generate_tests(cfg: ProjectConfig,
         print("[EvoSuite] No valid project classes; skip.")
         return
 
+    # --- 증분 모드: 바이트코드·파라미터가 같은 클래스는 기존 테스트 재사용 ---
+    params = _evosuite_params(cfg)
+    hashes = {c: _class_hash(classes_dir, c) for c in target_classes}
+    manifest = _load_manifest(cfg)
+    if manifest.get("params") != params:
+        manifest = {"params": params, "classes": {}}
+    if cfg.evosuite_incremental:
+        reused = [c for c in target_classes
+                  if hashes[c] is not None
+                  and manifest["classes"].get(c) == hashes[c]
+                  and _restore_tests(cfg, c)]
+        if reused:
+            print(f"[EvoSuite] {len(reused)} unchanged classes; reusing their tests.")
+        target_classes = [c for c in target_classes if c not in set(reused)]
+        if not target_classes:
+            print(f"[EvoSuite] Time: compile {t_compile:.1f}s, generate 0.0s")
+            print("[EvoSuite] All classes up to date.\n")
+            return
+
+    t1 = time.perf_counter()
     # --- 긴 명령행 분할 + 진행 로그 ---
     MAX_CMD = 8000
-    if len(",".join(target_classes)) > MAX_CMD:
+    if cfg.evosuite_workers > 1:
+        print(f"[EvoSuite] Generating {len(target_classes)} classes on "
+              f"{cfg.evosuite_workers} workers…")
+        status = _generate_parallel(cfg, classes_dir, target_classes)
+        bad = {c: s for c, s in status.items() if s != "ok"}
+        print(f"[EvoSuite] Summary: {len(status) - len(bad)} ok, "
+              f"{sum(s == 'failed' for s in bad.values())} failed, "
+              f"{sum(s == 'timeout' for s in bad.values())} timed out")
+        for c, s in bad.items():
+            print(f"    {c}: {s}")
+    elif len(",".join(target_classes)) > MAX_CMD:
         total = len(target_classes)
         print(f"[EvoSuite] {total} classes too long; running one-by-one.")
+        status = {}
         for idx, cls in enumerate(target_classes, 1):
             print(f"[EvoSuite]  ›  [{idx}/{total}]  {cls}")
             try:
-                generate_tests(cfg, target_classes=[cls])
+                _run_evosuite(cfg, classes_dir, [cls])
+                status[cls] = "ok"
+            except CommandTimeout as e:
+                status[cls] = "timeout"
+                print(f"[EvoSuite] WARNING: {cls} skipped ({e})")
             except Exception as e:
+                status[cls] = "failed"
                 print(f"[EvoSuite] WARNING: {cls} skipped ({e})")
-        return
+    else:
+        print(f"[EvoSuite] Batch generating {len(target_classes)} classes…")
+        before = {c: _output_stamps(cfg, c) for c in target_classes}
+        _run_evosuite(cfg, classes_dir, target_classes)
+        # one run for all classes: a class is ok only if EvoSuite rewrote its files
+        status = {}
+        for c in target_classes:
+            after = _output_stamps(cfg, c)
+            fresh = all(a is not None and a != b for a, b in zip(after, before[c]))
+            status[c] = "ok" if fresh else "failed"
+        failed = [c for c, s in status.items() if s != "ok"]
+        if failed:
+            print(f"[EvoSuite] WARNING: no fresh tests for {len(failed)} classes: "
+                  + ", ".join(failed))
+    t_generate = time.perf_counter() - t1
 
-    print(f"[EvoSuite] Batch generating {len(target_classes)} classes…")
-    cmd = [
-        "java", "-jar", str(cfg.evosuite_jar.resolve()),
-        "-class", ",".join(target_classes),
-        "-projectCP", str(classes_dir),
-        "-generateSuite",
-        "-Dtest_dir", str(cfg.generated_test_dir.resolve()),
-        "-seed", "42",
-        "-Djunit_check=true",
-    ]
-    run_cmd(cmd, cwd=cfg.project_dir)
-    print("[EvoSuite] Done.\n")
\ No newline at end of file
+    # only fresh output is pristine: a failed class may have a stale (even
+    # LLM-refactored) file in generated_test_dir that must not be stored
+    for c in target_classes:
+        if status.get(c) == "ok" and hashes[c] is not None and _store_tests(cfg, c):
+            manifest["classes"][c] = hashes[c]
+        else:
+            manifest["classes"].pop(c, None)
+    _manifest_path(cfg).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    print(f"[EvoSuite] Time: compile {t_compile:.1f}s, generate {t_generate:.1f}s")
+    print("[EvoSuite] Done.\n")
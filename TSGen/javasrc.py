@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from .tokens import count_tokens
+
+# ── lexical masking ─────────────────────────────────────────────────────
+def mask(source: str) -> str:
+    """
+    Return `source` with comments and the contents of string/char literals
+    and text blocks replaced by spaces (newlines kept), so braces, parens and
+    semicolons can be scanned structurally. Offsets match the original.
+    Raises ValueError on an unterminated comment or literal.
+    """
+    out = list(source)
+    i, n = 0, len(source)
+
+    def _blank(start: int, end: int) -> None:
+        for k in range(start, end):
+            if out[k] != "\n":
+                out[k] = " "
+
+    while i < n:
+        c = source[i]
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            end = n if end < 0 else end
+            _blank(i, end)
+            i = end
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            if end < 0:
+                raise ValueError("unterminated block comment")
+            _blank(i, end + 2)
+            i = end + 2
+        elif source.startswith('"""', i):
+            end = source.find('"""', i + 3)
+            while end > 0 and source[end - 1] == "\\":
+                end = source.find('"""', end + 1)
+            if end < 0:
+                raise ValueError("unterminated text block")
+            _blank(i + 3, end)
+            i = end + 3
+        elif c in "\"'":
+            j = i + 1
+            while j < n and source[j] != c:
+                if source[j] == "\n":
+                    raise ValueError(f"unterminated literal at offset {i}")
+                j += 2 if source[j] == "\\" else 1
+            if j >= n:
+                raise ValueError(f"unterminated literal at offset {i}")
+            _blank(i + 1, j)
+            i = j + 1
+        else:
+            i += 1
+    return "".join(out)
+
+# ── class structure ─────────────────────────────────────────────────────
+_TYPE_RE = re.compile(r"\b(class|interface|enum|record)\s+(\w+)")
+_ANNOTATION_RE = re.compile(r"@[\w.]+(\s*\((?:[^()]|\([^()]*\))*\))?")
+_IMPORT_RE = re.compile(r"^[ \t]*import\s+[\w.*\s]+;[ \t]*$", re.M)
+_PACKAGE_RE = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.M)
+_NAME_BEFORE_PAREN_RE = re.compile(r"(\w+)\s*\($")
+_FIELD_NAME_RE = re.compile(r"(\w+)\s*(?:\[\s*\]\s*)*(?:=|;|$)")
+_MODIFIERS = {"public", "protected", "private", "abstract", "static", "final",
+              "strictfp", "sealed", "non-sealed"}
+
+@dataclass
+class Member:
+    """One member of the top-level class body, with its leading whitespace/comments."""
+    text: str
+    kind: str                   # "test" | "method" | "field" | "type" | "other"
+    name: str
+    signature: str = ""         # methods: name + parameter list, whitespace-normalised
+
+@dataclass
+class JavaClass:
+    """A single top-level class split into prelude, header, members and footer."""
+    source: str
+    package: str
+    imports: List[str]
+    imports_span: Tuple[int, int]           # [start, end) of the import block
+    header_start: int                       # first annotation / modifier of the class
+    body_start: int                         # just after the class's opening brace
+    body_end: int                           # offset of the class's closing brace
+    name: str
+    members: List[Member] = field(default_factory=list)
+
+    @property
+    def header(self) -> str:
+        return self.source[self.header_start:self.body_start]
+
+    @property
+    def footer(self) -> str:
+        return self.source[self.body_end:]
+
+    @property
+    def tests(self) -> List[Member]:
+        return [m for m in self.members if m.kind == "test"]
+
+def _classify(head: str) -> Tuple[str, str, str]:
+    """(kind, name, signature) of a member from its masked text before the body/semicolon."""
+    is_test = bool(re.search(r"@(?:org\.junit\.(?:jupiter\.api\.)?)?Test\b", head))
+    bare = _ANNOTATION_RE.sub(" ", head).strip()
+    paren = bare.find("(")
+    decl = _TYPE_RE.search(bare)
+    if decl and (paren < 0 or decl.start() < paren):
+        return "type", decl.group(2), ""
+    eq = bare.find("=")
+    if paren >= 0 and (eq < 0 or paren < eq):
+        m = _NAME_BEFORE_PAREN_RE.search(bare[:paren + 1])
+        name = m.group(1) if m else ""
+        close = bare.rfind(")")
+        params = " ".join(bare[paren:close + 1].split())
+        return ("test" if is_test else "method"), name, name + params
+    if bare.startswith("{") or bare == "static":          # initializer blocks
+        return "other", "", ""
+    m = _FIELD_NAME_RE.search(bare[:eq] if eq >= 0 else bare)
+    return "field", (m.group(1) if m else ""), ""
+
+def _split_members(source: str, masked: str, start: int, end: int) -> List[Member]:
+    members: List[Member] = []
+    i = mstart = start
+    braces = parens = 0
+    head_end = -1               # where the member's signature ends ({ or ;)
+    while i < end:
+        c = masked[i]
+        if c == "(":
+            parens += 1
+        elif c == ")":
+            parens -= 1
+        elif c == "{" and parens == 0:
+            if braces == 0 and head_end < 0:
+                head_end = i
+            braces += 1
+        elif c == "}" and parens == 0:
+            braces -= 1
+            if braces == 0:
+                head = masked[mstart:head_end]
+                # `int[] X = {1, 2};` / `Foo f = new Foo() { … };` continue to the `;`
+                if "=" not in _ANNOTATION_RE.sub(" ", head):
+                    kind, name, sig = _classify(head)
+                    members.append(Member(source[mstart:i + 1], kind, name, sig))
+                    mstart, head_end = i + 1, -1
+        elif c == ";" and braces == 0 and parens == 0:
+            head = masked[mstart:head_end if head_end >= 0 else i]
+            kind, name, sig = _classify(head)
+            members.append(Member(source[mstart:i + 1], kind, name, sig))
+            mstart, head_end = i + 1, -1
+        i += 1
+    if mstart < end:
+        # whitespace / trailing comments before the closing brace
+        members.append(Member(source[mstart:end], "other", ""))
+    return members
+
+def parse_class(source: str) -> JavaClass:
+    """
+    Parse the first top-level type of a Java compilation unit.
+    Raises ValueError when the source has no type declaration, its
+    braces/parentheses do not balance, or there is stray text (e.g. prose
+    around an LLM answer) before or after the class.
+    """
+    masked = mask(source)
+    if masked.count("{") != masked.count("}") or masked.count("(") != masked.count(")"):
+        raise ValueError("unbalanced braces or parentheses")
+
+    imports = list(_IMPORT_RE.finditer(masked))
+    package = _PACKAGE_RE.search(masked)
+    prelude_end = max(imports[-1].end() if imports else 0, package.end() if package else 0)
+    decl = _TYPE_RE.search(masked, prelude_end)
+    if decl is None:
+        raise ValueError("no class declaration")
+    stray = _IMPORT_RE.sub("", _PACKAGE_RE.sub("", masked[:prelude_end]))
+    modifiers = _ANNOTATION_RE.sub(" ", masked[prelude_end:decl.start()]).split()
+    if stray.strip() or any(w not in _MODIFIERS for w in modifiers):
+        raise ValueError("unexpected text before the class declaration")
+    open_brace = masked.find("{", decl.end())
+    if open_brace < 0:
+        raise ValueError("class has no body")
+
+    depth, close = 0, -1
+    for k in range(open_brace, len(masked)):
+        if masked[k] == "{":
+            depth += 1
+        elif masked[k] == "}":
+            depth -= 1
+            if depth == 0:
+                close = k
+                break
+    if close < 0:
+        raise ValueError("class body is not closed")
+    if masked[close + 1:].strip():
+        raise ValueError("unexpected code after the class body")
+
+    gap = masked[prelude_end:decl.start()]
+    cls = JavaClass(
+        source=source,
+        package=package.group(1) if package else "",
+        imports=[source[m.start():m.end()].strip() for m in imports],
+        imports_span=(imports[0].start(), imports[-1].end()) if imports else (prelude_end, prelude_end),
+        header_start=prelude_end + len(gap) - len(gap.lstrip()),
+        body_start=open_brace + 1,
+        body_end=close,
+        name=decl.group(2),
+    )
+    cls.members = _split_members(source, masked, open_brace + 1, close)
+    return cls
+
+def count_tests(source: str) -> int:
+    return len(parse_class(source).tests)
+
+# ── syntax gate for LLM output ──────────────────────────────────────────
+_FENCE_BLOCK_RE = re.compile(r"^[ \t]*```[\w+-]*[ \t]*\n(.*?)(?:^[ \t]*```|\Z)", re.S | re.M)
+
+def strip_fences(text: str) -> str:
+    """The largest ```-fenced block of `text` (an unclosed fence runs to the end), else `text`."""
+    blocks = _FENCE_BLOCK_RE.findall(text)
+    if not blocks:
+        return text
+    return max(blocks, key=len).strip()
+
+def check_refactored(original: str, candidate: str) -> List[str]:
+    """
+    Cheap structural checks of a refactored test class against its original:
+    it must parse (balanced, one class, nothing around it) and keep the
+    package, class name and number of @Test methods. Returns the problems
+    found (empty = OK). Skipped if the original itself does not parse.
+    """
+    try:
+        before = parse_class(original)
+    except ValueError:
+        return []
+    try:
+        after = parse_class(candidate)
+    except ValueError as e:
+        return [f"malformed Java ({e})"]
+    problems = []
+    if after.package != before.package:
+        problems.append(f"package {after.package!r} instead of {before.package!r}")
+    if after.name != before.name:
+        problems.append(f"class {after.name!r} instead of {before.name!r}")
+    if len(after.tests) != len(before.tests):
+        problems.append(f"{len(after.tests)} @Test methods instead of {len(before.tests)}")
+    return problems
+
+# ── chunking / reassembly ───────────────────────────────────────────────
+def _render(cls: JavaClass, imports: List[str], members: List[Member]) -> str:
+    start, end = cls.imports_span
+    src = cls.source
+    if imports and start == end:
+        block = "\n".join(imports) + "\n"
+        prefix = src[:start] + ("\n" if start else "") + block
+    else:
+        prefix = src[:start] + "\n".join(imports)
+    return (prefix + src[end:cls.body_start]
+            + "".join(m.text for m in members) + src[cls.body_end:])
+
+def split_tests(source: str, max_tokens: int) -> List[str]:
+    """
+    Split a test class into compilable chunks: every chunk keeps the package,
+    imports, class declaration and all non-test members, plus a group of
+    @Test methods whose size stays within `max_tokens` (a single larger
+    method gets a chunk of its own). Returns [source] if it needs no split.
+    """
+    cls = parse_class(source)
+    shared = [m for m in cls.members if m.kind != "test" and m.text.strip()]
+    groups: List[List[Member]] = [[]]
+    size = 0
+    for m in cls.tests:
+        cost = count_tokens(m.text)
+        if groups[-1] and size + cost > max_tokens:
+            groups.append([])
+            size = 0
+        groups[-1].append(m)
+        size += cost
+    if len(groups) <= 1:
+        return [source]
+    # non-test members keep their place ahead of the tests
+    return [_render(cls, cls.imports, shared + group + [_NEWLINE]) for group in groups]
+
+_NEWLINE = Member("\n", "other", "")
+
+def _normalise(text: str) -> str:
+    return " ".join(text.split())
+
+def _sub_code(pattern: str, repl: str, text: str, count: int = 0) -> str:
+    """re.sub over the code of `text` only; comments and literals stay as they are."""
+    masked = mask(text)
+    out, last = [], 0
+    for i, m in enumerate(re.finditer(pattern, masked)):
+        if count and i == count:
+            break
+        out += [text[last:m.start()], repl]
+        last = m.end()
+    return "".join(out) + text[last:]
+
+def _rename(text: str, old: str, new: str) -> str:
+    return _sub_code(rf"\b{re.escape(old)}\b", new, text)
+
+def merge_chunks(original: str, replies: List[str]) -> str:
+    """
+    Reassemble refactored chunks (see `split_tests`) into one class.
+    Imports are merged in order of first appearance. Identical non-test
+    members (constants, helpers) are kept once; a constant that two chunks
+    declare differently is renamed in the later chunk. Test methods keep
+    chunk order, and duplicate test names get a numeric suffix.
+    Raises ValueError if a reply is not a parsable class or two chunks
+    define the same helper method differently.
+    """
+    base = parse_class(original)
+    imports: List[str] = list(base.imports)
+    shared: List[Member] = []
+    tests: List[Member] = []
+    fields: Dict[str, str] = {}             # name → normalised declaration
+    methods: Dict[str, str] = {}            # signature → normalised text
+    test_names: Dict[str, int] = {}
+
+    for idx, reply in enumerate(replies, 1):
+        cls = parse_class(reply)
+        imports += [imp for imp in cls.imports if imp not in imports]
+        renames = {m.name: f"{m.name}_{idx}" for m in cls.members
+                   if m.kind == "field" and fields.get(m.name, _normalise(m.text)) != _normalise(m.text)}
+        for m in cls.members:
+            if renames:
+                text = m.text
+                for old, new in renames.items():
+                    text = _rename(text, old, new)
+                m = Member(text, m.kind, renames.get(m.name, m.name), m.signature)
+            if m.kind == "test":
+                count = test_names.get(m.name, 0)
+                test_names[m.name] = count + 1
+                if count:
+                    new = f"{m.name}_{count + 1}"
+                    m = Member(_sub_code(rf"\b{re.escape(m.name)}(?=\s*\()", new, m.text, count=1),
+                               m.kind, new, m.signature)
+                tests.append(m)
+            elif m.kind == "field" and m.name:
+                if m.name not in fields:
+                    fields[m.name] = _normalise(m.text)
+                    shared.append(m)
+            elif m.kind in ("method", "type"):
+                key = m.signature or m.name
+                if key not in methods:
+                    methods[key] = _normalise(m.text)
+                    shared.append(m)
+                elif methods[key] != _normalise(m.text):
+                    raise ValueError(f"chunk {idx} defines {key} differently from an earlier chunk")
+            elif m.text.strip() and _normalise(m.text) not in {_normalise(x.text) for x in shared}:
+                shared.append(m)
+    return _render(base, imports, shared + tests + [_NEWLINE])
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from . import metrics
+from .config import ProjectConfig
+from .llm_client import EmptyReplyError, LLMJob, _client, _is_retryable, response_cache
+
+# ── OpenAI Batch API backend ────────────────────────────────────────────
+# One round's prompts are written as a JSONL request file, uploaded and run
+# as a single batch job. Everything goes through the same `openai.OpenAI`
+# client as synchronous calls, so `cfg.openai_base_url` can point it at a
+# local stand-in server.
+ENDPOINT = "/v1/chat/completions"
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+def _request_line(cfg: ProjectConfig, job: LLMJob) -> str:
+    return json.dumps({
+        "custom_id": job.key,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": {
+            "model": cfg.openai_model,
+            "messages": [{"role": "system", "content": job.system},
+                         {"role": "user", "content": job.prompt}],
+            **job.params,
+        },
+    }, ensure_ascii=False)
+
+def write_requests(cfg: ProjectConfig, jobs: List[LLMJob]) -> Path:
+    """
+    Write `jobs` as a batch request file and return it. The file lives in
+    result_dir/llm_batches/<content hash>/, so re-running the same round
+    finds the batch that was already submitted for it.
+    """
+    payload = "".join(_request_line(cfg, job) + "\n" for job in jobs)
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:16]
+    path = cfg.result_dir / "llm_batches" / digest / "requests.jsonl"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.is_file():
+        path.write_text(payload, encoding="utf-8")
+    return path
+
+def _call(cfg: ProjectConfig, fn: Callable, *args, **kwargs):
+    """
+    Batch API calls are few and slow-moving: retry transient errors with
+    doubling delays, up to `cfg.llm_max_retries` times, then re-raise.
+    """
+    delay = cfg.llm_backoff_base
+    for attempt in range(cfg.llm_max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == cfg.llm_max_retries or not _is_retryable(e):
+                raise
+            print(f"[LLM-Batch] {type(e).__name__}; retry {attempt + 1} in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 300.0)
+    raise RuntimeError("unreachable")
+
+def _submit(cfg: ProjectConfig, requests_path: Path):
+    """Upload the request file and create the batch, or re-attach to a live one."""
+    client = _client(cfg)
+    state_path = requests_path.with_name("batch.json")
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        state = {}
+    if state.get("id") and state.get("status") not in ("failed", "expired", "cancelled"):
+        print(f"[LLM-Batch] Re-attaching to batch {state['id']}")
+        return _call(cfg, client.batches.retrieve, state["id"])
+
+    with requests_path.open("rb") as f:
+        upload = _call(cfg, client.files.create, file=f, purpose="batch")
+    batch = _call(cfg, client.batches.create, input_file_id=upload.id, endpoint=ENDPOINT,
+                  completion_window=cfg.llm_batch_window,
+                  metadata={"project": cfg.project_name})
+    state_path.write_text(json.dumps({"id": batch.id, "input_file_id": upload.id,
+                                      "status": batch.status}, indent=2), encoding="utf-8")
+    print(f"[LLM-Batch] Submitted batch {batch.id} ({requests_path})")
+    return batch
+
+def _wait(cfg: ProjectConfig, batch, state_path: Path):
+    client = _client(cfg)
+    last = None
+    while batch.status not in TERMINAL:
+        counts = getattr(batch, "request_counts", None)
+        progress = (f"{counts.completed + counts.failed}/{counts.total}"
+                    if counts is not None else "?")
+        if (batch.status, progress) != last:
+            print(f"[LLM-Batch] {batch.id}: {batch.status}, {progress} requests done")
+            last = (batch.status, progress)
+        time.sleep(cfg.llm_batch_poll)
+        batch = _call(cfg, client.batches.retrieve, batch.id)
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    state.update(status=batch.status, output_file_id=batch.output_file_id,
+                 error_file_id=batch.error_file_id)
+    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    return batch
+
+def _parse_output(text: str, replies: Dict[str, str | Exception], usage: Dict[str, int]) -> None:
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        rec = json.loads(line)
+        response = rec.get("response") or {}
+        body = response.get("body") or {}
+        if rec.get("error") or response.get("status_code", 200) >= 400:
+            error = rec.get("error") or body.get("error")
+            replies[rec["custom_id"]] = RuntimeError(f"batch request failed: {error}")
+            continue
+        reply = (body["choices"][0]["message"]["content"] or "").strip()
+        replies[rec["custom_id"]] = reply or EmptyReplyError("empty reply in batch output")
+        u = body.get("usage") or {}
+        usage["prompt_tokens"] += u.get("prompt_tokens", 0)
+        usage["completion_tokens"] += u.get("completion_tokens", 0)
+        usage["cached_prompt_tokens"] += (u.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+
+def _run_remote(cfg: ProjectConfig, jobs: List[LLMJob]) -> Dict[str, str | Exception]:
+    requests_path = write_requests(cfg, jobs)
+    replies: Dict[str, str | Exception] = {}
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0}
+    with metrics.span(cfg, "llm.batch", requests=len(jobs)) as m:
+        batch = _submit(cfg, requests_path)
+        batch = _wait(cfg, batch, requests_path.with_name("batch.json"))
+        client = _client(cfg)
+        for file_id, name in ((batch.output_file_id, "output.jsonl"),
+                              (batch.error_file_id, "errors.jsonl")):
+            if not file_id:
+                continue
+            text = _call(cfg, client.files.content, file_id).text
+            requests_path.with_name(name).write_text(text, encoding="utf-8")
+            _parse_output(text, replies, usage)
+        m.update(batch_id=batch.id, status=batch.status, **usage)
+    if batch.status != "completed":
+        print(f"[LLM-Batch] Batch {batch.id} ended as {batch.status}")
+    for job in jobs:
+        replies.setdefault(job.key, RuntimeError(f"no result in batch {batch.id} ({batch.status})"))
+    return replies
+
+def run_batch(cfg: ProjectConfig, jobs: List[LLMJob],
+              on_result: Callable[[LLMJob, str | Exception], None] | None = None
+              ) -> Dict[str, str | Exception]:
+    """
+    Drop-in for `run_jobs` that sends all uncached jobs as one Batch API
+    job, waits for it (polling every `cfg.llm_batch_poll` seconds) and
+    returns {job.key: reply | exception} in job order. Replies are stored
+    in the response cache like synchronous ones.
+    """
+    results: Dict[str, str | Exception] = {}
+    if not jobs:
+        return results
+    cache = response_cache(cfg)
+    keys = {job.key: cache.key(cfg.openai_model, job.system, job.prompt, job.params)
+            for job in jobs}
+    for job in jobs:
+        hit = cache.get(keys[job.key])
+        if hit is not None:
+            results[job.key] = hit
+    pending = [job for job in jobs if job.key not in results]
+    if cache.mode != "off":
+        print(f"[LLM-Batch] Cache: {len(jobs) - len(pending)}/{len(jobs)} hits")
+
+    if pending:
+        replies = _run_remote(cfg, pending)
+        for job in pending:
+            reply = replies[job.key]
+            if not isinstance(reply, Exception):
+                cache.put(keys[job.key], reply)
+            results[job.key] = reply
+
+    ordered: Dict[str, str | Exception] = {}
+    for job in jobs:
+        ordered[job.key] = results[job.key]
+        if on_result is not None:
+            on_result(job, results[job.key])
+    return ordered
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Mapping
+
+CACHE_MODES = ("use", "refresh", "off")
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of chat-completion replies.
+
+    Key = sha256(model, system prompt, user prompt, sampling params); one JSON
+    file per entry under `root/<2 hex>/<key>.json`. A hit touches the file's
+    mtime, and once the total size exceeds `max_bytes` the least recently
+    used entries are evicted.
+
+    mode: "use"     → read and write
+          "refresh" → never read, overwrite with fresh replies
+          "off"     → bypass completely
+    """
+
+    def __init__(self, root: Path, max_bytes: int, mode: str = "use"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode!r} (expected one of {CACHE_MODES})")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total: int | None = None        # computed lazily on first put
+
+    @staticmethod
+    def key(model: str, system: str, prompt: str, params: Mapping[str, object]) -> str:
+        blob = json.dumps(
+            {"model": model, "system": system, "prompt": prompt, "params": dict(params)},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        if self.mode == "off":
+            return None
+        path = self._path(key)
+        reply = None
+        if self.mode == "use":
+            try:
+                reply = json.loads(path.read_text(encoding="utf-8"))["reply"]
+                os.utime(path)                   # LRU: mark as recently used
+            except (OSError, ValueError, KeyError):
+                reply = None
+        with self._lock:
+            if reply is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return reply
+
+    def put(self, key: str, reply: str) -> None:
+        if self.mode == "off":
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"reply": reply}, ensure_ascii=False).encode("utf-8")
+        old_size = path.stat().st_size if path.is_file() else 0
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        with self._lock:
+            if self._total is None:
+                self._total = sum(p.stat().st_size for p in self.root.rglob("*.json"))
+            else:
+                self._total += len(data) - old_size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def discard(self, key: str) -> None:
+        """Drop one entry, e.g. a reply that turned out to be unusable."""
+        if self.mode == "off":
+            return
+        path = self._path(key)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._total is not None:
+                self._total -= size
+
+    def _evict(self) -> None:
+        # caller holds the lock; drop oldest-used entries down to 90 % of the bound
+        entries = []
+        for p in self.root.rglob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, p in entries:
+            if total <= target:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+        self._total = total
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
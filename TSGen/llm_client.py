@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Callable, Dict, List
+
+import openai
+
+from . import metrics
+from .config import ProjectConfig
+from .llm_cache import ResponseCache
+from .tokens import count_tokens
+
+# ── job description ─────────────────────────────────────────────────────
+@dataclass
+class LLMJob:
+    """One chat-completion request. `key` identifies the job in the results."""
+    key: str
+    system: str
+    prompt: str
+    params: Dict[str, object] = field(default_factory=dict)
+
+    @cached_property
+    def input_tokens(self) -> int:
+        return count_tokens(self.system) + count_tokens(self.prompt)
+
+    def estimate_tokens(self) -> int:
+        # the completion budget counts towards TPM too
+        budget = self.params.get("max_completion_tokens") or self.params.get("max_tokens") or 0
+        return self.input_tokens + int(budget)
+
+# ── rate limiting ───────────────────────────────────────────────────────
+class RateLimiter:
+    """Sliding 60-second window over requests and (estimated) tokens. 0 = unlimited."""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._lock = threading.Lock()
+        self._events: deque[tuple[float, int]] = deque()
+
+    def acquire(self, tokens: int) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= 60:
+                    self._events.popleft()
+                used_tokens = sum(t for _, t in self._events)
+                req_ok = not self.rpm or len(self._events) < self.rpm
+                # a single request larger than the whole budget still goes through alone
+                tok_ok = not self.tpm or not self._events or used_tokens + tokens <= self.tpm
+                if req_ok and tok_ok:
+                    self._events.append((now, tokens))
+                    return
+                wait = 60 - (now - self._events[0][0])
+            time.sleep(max(wait, 0.05))
+
+_limiters: Dict[tuple, RateLimiter] = {}
+_clients: Dict[str | None, openai.OpenAI] = {}
+_caches: Dict[tuple, ResponseCache] = {}
+_registry_lock = threading.Lock()
+
+def _limiter(cfg: ProjectConfig) -> RateLimiter:
+    # shared per (endpoint, limits) so that concurrent projects respect one quota
+    key = (cfg.openai_base_url, cfg.llm_requests_per_minute, cfg.llm_tokens_per_minute)
+    with _registry_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(cfg.llm_requests_per_minute, cfg.llm_tokens_per_minute)
+        return _limiters[key]
+
+def response_cache(cfg: ProjectConfig) -> ResponseCache:
+    key = (cfg.llm_cache_dir.resolve(), cfg.llm_cache_mode, cfg.llm_cache_max_mb)
+    with _registry_lock:
+        if key not in _caches:
+            _caches[key] = ResponseCache(cfg.llm_cache_dir, cfg.llm_cache_max_mb * 1024 * 1024,
+                                         cfg.llm_cache_mode)
+        return _caches[key]
+
+def _client(cfg: ProjectConfig) -> openai.OpenAI:
+    with _registry_lock:
+        if cfg.openai_base_url not in _clients:
+            # retries are handled below, with jitter and the shared limiter
+            _clients[cfg.openai_base_url] = openai.OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=cfg.openai_base_url,
+                max_retries=0,
+            )
+        return _clients[cfg.openai_base_url]
+
+# ── retries ─────────────────────────────────────────────────────────────
+class EmptyReplyError(RuntimeError):
+    """The API answered without any content (never cached; retried like a 5xx)."""
+
+def _is_retryable(err: Exception) -> bool:
+    if isinstance(err, (openai.RateLimitError, openai.APIConnectionError, EmptyReplyError)):
+        return True
+    if isinstance(err, openai.APIStatusError):
+        return err.status_code == 429 or err.status_code >= 500
+    return False
+
+def _retry_after(err: Exception) -> float | None:
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def complete(cfg: ProjectConfig, job: LLMJob) -> str:
+    """
+    Send one job (rate-limited, retried on 429/5xx) and return the stripped reply.
+    Replies are served from / stored in the on-disk response cache.
+    """
+    with metrics.span(cfg, "llm", file=job.key, bytes_in=len(job.prompt.encode()),
+                      input_tokens=job.input_tokens) as m:
+        cache = response_cache(cfg)
+        cache_key = cache.key(cfg.openai_model, job.system, job.prompt, job.params)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            m.update(cached=True, bytes_out=len(cached.encode()))
+            return cached
+
+        limiter = _limiter(cfg)
+        client = _client(cfg)
+        for attempt in range(cfg.llm_max_retries + 1):
+            limiter.acquire(job.estimate_tokens())
+            try:
+                resp = client.chat.completions.create(
+                    model=cfg.openai_model,
+                    messages=[{"role": "system", "content": job.system},
+                              {"role": "user", "content": job.prompt}],
+                    **job.params,
+                )
+                reply = (resp.choices[0].message.content or "").strip()
+                if not reply:
+                    raise EmptyReplyError(f"empty reply (finish_reason="
+                                          f"{getattr(resp.choices[0], 'finish_reason', None)})")
+                usage = getattr(resp, "usage", None)
+                details = getattr(usage, "prompt_tokens_details", None)
+                m.update(cached=False, retries=attempt, bytes_out=len(reply.encode()),
+                         prompt_tokens=getattr(usage, "prompt_tokens", 0),
+                         # prefix tokens served from the provider's prompt cache
+                         cached_prompt_tokens=getattr(details, "cached_tokens", 0) or 0,
+                         completion_tokens=getattr(usage, "completion_tokens", 0))
+                cache.put(cache_key, reply)
+                return reply
+            except Exception as e:
+                if attempt == cfg.llm_max_retries or not _is_retryable(e):
+                    m.update(retries=attempt, error=type(e).__name__)
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    # exponential backoff with full jitter
+                    delay = random.uniform(0, min(60.0, cfg.llm_backoff_base * 2 ** attempt))
+                print(f"[LLM] {job.key}: {type(e).__name__}, retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+def run_jobs(cfg: ProjectConfig, jobs: List[LLMJob],
+             on_result: Callable[[LLMJob, str | Exception], None] | None = None
+             ) -> Dict[str, str | Exception]:
+    """
+    Run `jobs` on a pool of `cfg.llm_concurrency` threads (inline when only
+    one thread would be used).
+    Returns {job.key: reply} in job order; failed jobs map to their exception.
+    `on_result(job, reply)` is called on the caller's thread, in job order,
+    as soon as each reply is available.
+    """
+    results: Dict[str, str | Exception] = {}
+    if not jobs:
+        return results
+
+    def _run(job: LLMJob) -> str | Exception:
+        try:
+            return complete(cfg, job)
+        except Exception as e:
+            return e
+
+    cache = response_cache(cfg)
+    hits0, misses0 = cache.hits, cache.misses
+    workers = max(1, min(cfg.llm_concurrency, len(jobs)))
+    pool = ThreadPoolExecutor(max_workers=workers,
+                              thread_name_prefix=f"{threading.current_thread().name}/llm"
+                              ) if workers > 1 else None
+    try:
+        for job, reply in zip(jobs, pool.map(_run, jobs) if pool else map(_run, jobs)):
+            results[job.key] = reply
+            if on_result is not None:
+                on_result(job, reply)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if cache.mode != "off":
+        hits, lookups = cache.hits - hits0, cache.hits + cache.misses - hits0 - misses0
+        print(f"[LLM] Cache: {hits}/{lookups} hits ({100 * hits / lookups:.0f}%), "
+              f"{cache.evictions} evicted so far")
+    return results
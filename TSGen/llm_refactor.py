@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import os
 import textwrap
+import threading
 import openai
 import shutil
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Collection, Dict, List
 
 import re
 from collections import Counter
@@ -28,7 +29,14 @@ def _prettify_smell(name: str) -> str:
     name = re.sub(r"(?<!^)(?=[A-Z])", " ", name)
     return name.strip().title()
 
+from . import metrics
 from .config import ProjectConfig
+from .llm_client import LLMJob, response_cache, run_jobs
+from .llm_batch import run_batch
+from .tokens import count_tokens, exact as exact_tokens
+from .buildlog import parse_build_log, diagnostics_for, format_diagnostics
+from .javasrc import check_refactored, merge_chunks, split_tests, strip_fences
+from .patches import PatchError, apply_edits, parse_edits
 
 if not os.getenv("OPENAI_API_KEY"):
     raise ValueError("OPENAI_API_KEY environment variable is required")
@@ -47,20 +55,22 @@ SYSTEM_PROMPT = textwrap.dedent(
     """
 ).strip()
 
+# Guides come first so prompts for files with the same smells share a long,
+# identical prefix (system prompt + guide blocks) for provider-side caching.
 PROMPT_TEMPLATE = """<s>[INST]
-You are given the entire contents of a Java test class {TEST_CLASS} below.
+Below are the Safe‑Fix checklists for the detected smells. 
+Apply **every checklist item** that is relevant while preserving functional behaviour and coverage.
 
-```java
-{TEST_SOURCE}
-```
+{SMELL_GUIDE}
 
 This test code currently exhibits the following test smells detected by static analysis:
 {DETECTED_SMELLS}
 
-Below are the Safe‑Fix checklists for the detected smells. 
-Apply **every checklist item** that is relevant while preserving functional behaviour and coverage.
+You are given the entire contents of a Java test class {TEST_CLASS} below.
 
-{SMELL_GUIDE}
+```java
+{TEST_SOURCE}
+```
 
 **Output rules**
 Return ONLY the final Java source code – no explanation, comments, or markdown fences. Output strictly valid Java source *only*.
@@ -94,77 +104,333 @@ Fix the compilation errors while preserving the test functionality. Return ONLY
 [/INST]
 """
 
-def _load_guide(cfg: ProjectConfig) -> str:
+# ── edit formats: ask for SEARCH/REPLACE blocks or a unified diff instead ──
+EDIT_SYSTEM_PROMPT = SYSTEM_PROMPT.replace(
+    "Output strictly valid Java source *only*.",
+    "Output only the requested edits to the Java source.")
+
+EDIT_RULES = {
+    "search_replace": textwrap.dedent(
+        """
+        Do NOT return the whole file. Return only the changes, as one or more SEARCH/REPLACE blocks:
+
+        <<<<<<< SEARCH
+        exact lines copied from the current code, with their indentation
+        =======
+        the lines that replace them
+        >>>>>>> REPLACE
+
+        Every SEARCH section must match the current code exactly and in only one place; include
+        a few unchanged lines if needed to make it unique. Add new imports or constants with
+        their own blocks. Write nothing outside the blocks.
+        """).strip(),
+    "udiff": textwrap.dedent(
+        """
+        Do NOT return the whole file. Return only the changes as a unified diff against the
+        current code: `@@` hunk headers, unchanged context lines starting with a space, removed
+        lines with `-`, added lines with `+`. Include enough context lines for every hunk to
+        match in only one place. Write nothing outside the diff.
+        """).strip(),
+}
+
+# the whole-file output rule of each prompt template, swapped for EDIT_RULES
+_OUTPUT_RULE_RE = re.compile(
+    r"Return ONLY the (?:final|corrected) Java source code – no explanation, comments, "
+    r"or markdown fences\.(?: Output strictly valid Java source \*only\*\.)?")
+
+# appended to a whole-file request when its previous reply was rejected
+REGENERATE_NOTE = ("Your previous answer was rejected before compilation: {PROBLEMS}. "
+                   "Return the complete corrected Java class, following every rule above.")
+
+def _make_job(cfg: ProjectConfig, key: str, prompt: str,
+              params: Dict[str, object]) -> tuple[LLMJob, LLMJob]:
     """
-    Concatenate all `<smell>.md` files in `cfg.smell_guides_dir` into a single
-    Markdown string that is easy to split later.
-
-    * The **first Markdown heading** in each file (e.g. `# Sleepy Test`) is kept
-      as the smell’s canonical title but normalised to level‑2 (`##`).
-    * Any subsequent level‑2 headings (`## `) inside the same file are demoted
-      to level‑3 (`### `) so that our later `re.split(r"\\n(?=## )", ...)`
-      correctly treats the entire block as one smell section.
-    * If a file lacks a heading, we derive one from the filename.
+    (job to send, full-file form of it). With `cfg.llm_edit_format` other
+    than "whole", the job asks for edits instead of the complete source;
+    otherwise both are the same job.
     """
-    parts: list[str] = []
-
-    for md in sorted(cfg.smell_guides_dir.glob("*.md")):
-        lines = md.read_text(encoding="utf-8").splitlines()
+    full = LLMJob(key, SYSTEM_PROMPT, prompt, params)
+    if cfg.llm_edit_format == "whole":
+        return full, full
+    if cfg.llm_edit_format not in EDIT_RULES:
+        raise ValueError(f"Unknown edit format: {cfg.llm_edit_format!r} "
+                         f"(expected 'whole' or one of {sorted(EDIT_RULES)})")
+    rules = EDIT_RULES[cfg.llm_edit_format]
+    edit_prompt, n = _OUTPUT_RULE_RE.subn(lambda _: rules, prompt, count=1)
+    if not n:
+        edit_prompt = f"{prompt}\n{rules}"
+    return LLMJob(key, EDIT_SYSTEM_PROMPT, edit_prompt, params), full
+
+def _apply_reply(base: str, reply: str) -> str:
+    """Apply the edits in `reply` to `base`."""
+    edits = parse_edits(reply)
+    if not edits:
+        raise PatchError("no edits found in the reply")
+    return apply_edits(base, edits)
+
+def _regenerate(full: LLMJob, problems: str) -> LLMJob:
+    """`full` again, telling the model why its last answer was rejected."""
+    note = REGENERATE_NOTE.format(PROBLEMS=problems)
+    head, inst, tail = full.prompt.rpartition("[/INST]")
+    prompt = f"{head}{note}\n\n{inst}{tail}" if inst else f"{full.prompt}\n{note}"
+    return LLMJob(full.key, full.system, prompt, full.params)
+
+def _norm_smell(name: str) -> str:
+    """'Empty_Test', 'EmptyTest' and 'Empty Test' all become 'emptytest'."""
+    return re.sub(r"[\s_]+", "", name).lower()
+
+def _compile_guide(md: Path) -> tuple[str, str]:
+    """
+    Turn one `<smell>.md` file into (normalised smell name, guide block).
 
-        # Strip leading blank lines
-        while lines and not lines[0].strip():
-            lines.pop(0)
+    * The **first Markdown heading** (e.g. `# Sleepy Test`) is kept as the
+      smell’s canonical title but normalised to level‑2 (`##`).
+    * Any subsequent level‑2 headings (`## `) are demoted to level‑3 (`### `)
+      so each block has exactly one `##` heading.
+    * If a file lacks a heading, we derive one from the filename.
+    """
+    lines = md.read_text(encoding="utf-8").splitlines()
 
-        # Determine / insert the primary heading
-        if lines and lines[0].startswith("#"):
-            heading_text = lines[0].lstrip("#").strip()
-            lines[0] = f"## {heading_text}"
-        else:
-            heading_text = md.stem.replace("_", " ").title()
-            lines.insert(0, f"## {heading_text}")
+    # Strip leading blank lines
+    while lines and not lines[0].strip():
+        lines.pop(0)
 
-        # Demote internal `## ` headings to `### `
-        for i in range(1, len(lines)):
-            if lines[i].startswith("## ") and not lines[i].startswith("### "):
-                lines[i] = "#" + lines[i]   # "## " → "### "
+    # Determine / insert the primary heading
+    if lines and lines[0].startswith("#"):
+        heading_text = lines[0].lstrip("#").strip()
+        lines[0] = f"## {heading_text}"
+    else:
+        heading_text = md.stem.replace("_", " ").title()
+        lines.insert(0, f"## {heading_text}")
 
-        parts.append("\n".join(lines))
+    # Demote internal `## ` headings to `### `
+    for i in range(1, len(lines)):
+        if lines[i].startswith("## ") and not lines[i].startswith("### "):
+            lines[i] = "#" + lines[i]   # "## " → "### "
 
-    return "\n\n".join(parts)
+    return _norm_smell(heading_text), "\n".join(lines)
 
-def _select_relevant_guides(all_guides: str, smells: List[str]) -> str:
+class GuideIndex:
     """
-    Return only the guide sections relevant to `smells`.
-
-    A smell may appear in several naming styles (e.g., "Empty_Test",
-    "EmptyTest", "Empty Test").  We normalise by removing spaces/underscores and
-    lower‑casing before comparison.
+    The smell guides of one directory compiled into
+    {normalised smell name: guide block}. Each file is re-parsed only when
+    its mtime changes (or it is added/removed).
     """
-    import re
 
-    def _norm(name: str) -> str:
-        return re.sub(r"[\\s_]+", "", name).lower()
-
-    targets = {_norm(s) for s in smells}
-    if not targets:
-        return ""  # no guide needed
-
-    selected: list[str] = []
-    for block in re.split(r"\n(?=## )", all_guides):
-        if not block.strip():
-            continue
-        heading = block.splitlines()[0].lstrip("#").strip()
-        if _norm(heading) in targets:
-            selected.append(block)
-
-    return "\n\n".join(selected)
-            
-
-def refactor_tests(cfg: ProjectConfig, smell_map: Dict[str, List[str]], archive_dir: Path | None = None) -> None:
-    guide = _load_guide(cfg)
-    for src_file in cfg.generated_test_dir.rglob("*.java"):
-        if "scaffolding" in src_file.name.lower():
-            continue
+    def __init__(self, root: Path):
+        self.root = root
+        self._files: Dict[Path, tuple[int, str, str]] = {}     # path → (mtime_ns, key, block)
+        self._lock = threading.Lock()
+
+    def sections(self) -> Dict[str, str]:
+        with self._lock:
+            files = {}
+            for md in sorted(self.root.glob("*.md")):
+                mtime = md.stat().st_mtime_ns
+                entry = self._files.get(md)
+                if entry is None or entry[0] != mtime:
+                    entry = (mtime, *_compile_guide(md))
+                files[md] = entry
+            self._files = files
+            return {key: block for _, key, block in files.values()}
+
+    def select(self, smells: Collection[str]) -> List[str]:
+        """Guide blocks for `smells`, in a stable (sorted) order."""
+        sections = self.sections()
+        return [sections[k] for k in sorted({_norm_smell(s) for s in smells}) if k in sections]
+
+_guide_indexes: Dict[Path, GuideIndex] = {}
+_guide_lock = threading.Lock()
+
+def _guide_index(cfg: ProjectConfig) -> GuideIndex:
+    root = cfg.smell_guides_dir.resolve()
+    with _guide_lock:
+        if root not in _guide_indexes:
+            _guide_indexes[root] = GuideIndex(root)
+        return _guide_indexes[root]
+
+def _save_refactored(cfg: ProjectConfig, src_file: Path, improved: str,
+                     archive_dir: Path | None) -> Path:
+    # Preserve original sub‑package folder when saving
+    rel_path = src_file.relative_to(cfg.generated_test_dir)
+    out_path = cfg.refactored_test_dir / rel_path
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # write-then-rename: concurrent builds copy this tree and must never see half a file
+    tmp_path = out_path.with_name(f".{out_path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(improved, encoding="utf-8")
+    os.replace(tmp_path, out_path)
+
+    # ----- archive per-round -----
+    if archive_dir is not None:
+        archive_path = archive_dir / rel_path
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(out_path, archive_path)
+    return out_path
+
+def _within_budget(cfg: ProjectConfig, job: LLMJob) -> bool:
+    return not cfg.llm_max_input_tokens or job.input_tokens <= cfg.llm_max_input_tokens
+
+def _tokens_msg(counts: int | str) -> str:
+    """'~N input tokens', flagged as an estimate when tiktoken is unavailable."""
+    return f"~{counts} input tokens" + ("" if exact_tokens() else " (estimated)")
+
+def _add_jobs(cfg: ProjectConfig, jobs: List[LLMJob], sources: Dict[str, Path],
+              requests: Dict[str, tuple[str, LLMJob]], src_file: Path, source: str,
+              make_prompt: Callable[[str], str], params: Dict[str, object]) -> int:
+    """
+    Queue the job(s) for one test file and return how many were added.
+    With `cfg.llm_chunk_tokens`, a class larger than that is split into
+    groups of @Test methods (each with the shared header) refactored as
+    separate jobs and reassembled by `_run_and_save`. A prompt above
+    `cfg.llm_max_input_tokens` is split into ever smaller chunks until every
+    request fits; a file that cannot be made to fit is skipped.
+    Every job is recorded in `requests` as
+    {job key: (source it was asked about, full-file form of the job)}.
+    """
+    key = src_file.relative_to(cfg.generated_test_dir).as_posix()
+    size = cfg.llm_chunk_tokens
+    while True:
+        chunks, splittable = [source], True
+        if size:
+            try:
+                chunks = split_tests(source, size)
+            except ValueError as e:
+                print(f"  ↳ cannot split {src_file.name} ({e}); sending it whole.")
+                splittable = False
+        made = [(chunk, *_make_job(cfg, key if len(chunks) == 1 else f"{key}#{i}",
+                                   make_prompt(chunk), params))
+                for i, chunk in enumerate(chunks, 1)]
+        new_jobs = [job for _, job, _ in made]
+        if all(_within_budget(cfg, job) for job in new_jobs):
+            break
+        size = (size or count_tokens(source)) // 2
+        if not splittable or size < 64:
+            largest = max(job.input_tokens for job in new_jobs)
+            print(f"  ↳ SKIPPED: {_tokens_msg(largest)} exceeds the "
+                  f"{cfg.llm_max_input_tokens}-token budget")
+            return 0
+
+    for chunk, job, full in made:
+        jobs.append(job)
+        sources[job.key] = src_file
+        requests[job.key] = (chunk, full)
+    if len(new_jobs) > 1:
+        print(f"  ↳ split into {len(new_jobs)} chunks of @Test methods, "
+              + _tokens_msg("/".join(str(job.input_tokens) for job in new_jobs)))
+    else:
+        print(f"  ↳ {_tokens_msg(new_jobs[0].input_tokens)}")
+    return len(new_jobs)
+
+def _run_and_save(cfg: ProjectConfig, jobs: List[LLMJob], sources: Dict[str, Path],
+                  archive_dir: Path | None, saved_msg: str = "saved",
+                  on_saved: Callable[[Path], None] | None = None,
+                  requests: Dict[str, tuple[str, LLMJob]] | None = None) -> List[Path]:
+    """
+    Send `jobs` through the concurrent client (or, with `cfg.llm_backend ==
+    "batch"`, as one Batch API job) and write each file as soon as
+    its last job (and every job before it) is done; `on_saved(src_file)`
+    follows each write. Chunked files are merged back into one class and
+    fail as a whole if any chunk fails.
+
+    Replies to jobs in `requests` are checked before anything is written:
+    edit replies are applied to their base source, whole-file replies lose
+    any markdown fences, and with `cfg.llm_syntax_gate` the result must
+    parse and keep the class name and @Test count (`check_refactored`). A
+    rejected reply is re-asked in full-file form, naming the problem, up to
+    `cfg.llm_regen_retries` times; after that the file fails without ever
+    reaching the build.
+    Returns the source files whose refactored version was saved.
+    """
+    done: List[Path] = []
+    requests = requests or {}
+    keys_of: Dict[Path, List[str]] = {}
+    for job in jobs:
+        keys_of.setdefault(sources[job.key], []).append(job.key)
+    replies: Dict[str, str | Exception] = {}
+    attempts: Counter = Counter()
+    retry: List[LLMJob] = []
+
+    def _save(src_file: Path) -> None:
+        keys = keys_of[src_file]
+        if any(k not in replies for k in keys):
+            return
+        parts = [replies[k] for k in keys]
+        failed = next((r for r in parts if isinstance(r, Exception)), None)
+        reply = parts[0]
+        if failed is None and len(parts) > 1:
+            try:
+                reply = merge_chunks(src_file.read_text(encoding="utf-8"), parts)
+            except ValueError as e:
+                failed = ValueError(f"cannot merge {len(parts)} chunks: {e}")
+        if failed is not None:
+            print(f"[LLM] FAILED {src_file.name}: {failed}")
+            return
+        out_path = _save_refactored(cfg, src_file, reply, archive_dir)
+        done.append(src_file)
+        print(f"[LLM] {saved_msg} → {out_path}")
+        if on_saved is not None:
+            on_saved(src_file)
+
+    def _check(job: LLMJob, base: str, reply: str) -> str:
+        if job.system == EDIT_SYSTEM_PROMPT:
+            reply = _apply_reply(base, reply)
+        else:
+            reply = strip_fences(reply)
+        if cfg.llm_syntax_gate:
+            with metrics.span(cfg, "syntax_gate", file=job.key) as m:
+                problems = check_refactored(base, reply)
+                m["status"] = "rejected" if problems else "ok"
+            if problems:
+                raise ValueError("; ".join(problems))
+        return reply
+
+    def _collect(job: LLMJob, reply: str | Exception) -> None:
+        if job.key in requests and not isinstance(reply, Exception):
+            base, full = requests[job.key]
+            try:
+                reply = _check(job, base, reply)
+            except ValueError as e:                 # PatchError or gate rejection
+                # never replay a rejected reply from the cache on a later run
+                cache = response_cache(cfg)
+                cache.discard(cache.key(cfg.openai_model, job.system, job.prompt, job.params))
+                attempts[job.key] += 1
+                if attempts[job.key] <= cfg.llm_regen_retries:
+                    print(f"[LLM] {job.key}: reply rejected ({e}); regenerating")
+                    retry.append(_regenerate(full, str(e)))
+                    return
+                reply = e
+        replies[job.key] = reply
+        _save(sources[job.key])
+
+    runner = run_batch if cfg.llm_backend == "batch" else run_jobs
+    pending = jobs
+    while pending:
+        runner(cfg, pending, on_result=_collect)
+        pending, retry = retry, []
+    return done
+
+def _test_sources(cfg: ProjectConfig, only: Collection[str | Path] | None = None) -> List[Path]:
+    """
+    Non-scaffolding test files, optionally restricted to the file names in
+    `only`. If `only` holds Paths, exactly those files are used without
+    scanning the test tree.
+    """
+    if only is not None and all(isinstance(f, Path) for f in only):
+        return [f for f in only if f.is_file()]
+    return [f for f in sorted(cfg.generated_test_dir.rglob("*.java"))
+            if "scaffolding" not in f.name.lower()
+            and (only is None or f.name in only)]
+
+def refactor_tests(cfg: ProjectConfig, smell_map: Dict[str, List[str]],
+                   archive_dir: Path | None = None,
+                   only: Collection[str | Path] | None = None,
+                   on_saved: Callable[[Path], None] | None = None) -> List[Path]:
+    guides = _guide_index(cfg)
+    jobs: List[LLMJob] = []
+    sources: Dict[str, Path] = {}
+    requests: Dict[str, tuple[str, LLMJob]] = {}
+    for src_file in _test_sources(cfg, only):
         print(f"[LLM] refactoring {src_file.name}...")
             
         raw_smells = smell_map.get(src_file.name, [])
@@ -182,113 +448,85 @@ def refactor_tests(cfg: ProjectConfig, smell_map: Dict[str, List[str]], archive_
             for s, c in pretty_counts.items()
         )
         
-        focused_guide = _select_relevant_guides(guide, unique_smells)
+        focused_guide = "\n\n".join(guides.select(unique_smells))
                 
-        prompt = PROMPT_TEMPLATE.format(
-            TEST_CLASS=src_file.name,
-            TEST_SOURCE=src_file.read_text(encoding="utf-8"),
-            DETECTED_SMELLS=smells_str,
-            SMELL_GUIDE=focused_guide,
-        )
-        
-        resp = openai.chat.completions.create(
-            model=cfg.openai_model,
-            messages=[{"role":"system","content":SYSTEM_PROMPT},
-                      {"role":"user","content":prompt}],
-            temperature=0.1, max_tokens=8192,
-        )
-        improved = resp.choices[0].message.content.strip()
-
-        # Preserve original sub‑package folder when saving
-        rel_path = src_file.relative_to(cfg.generated_test_dir)
-        out_path = cfg.refactored_test_dir / rel_path
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-
-        out_path.write_text(improved, encoding="utf-8")
-        # ----- archive per-round -----
-        if archive_dir is not None:
-            archive_path = archive_dir / rel_path
-            archive_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(out_path, archive_path)
-            
-        print(f"[LLM] saved → {out_path}")
+        def _prompt(source: str) -> str:
+            return PROMPT_TEMPLATE.format(
+                TEST_CLASS=src_file.name,
+                TEST_SOURCE=source,
+                DETECTED_SMELLS=smells_str,
+                SMELL_GUIDE=focused_guide,
+            )
+        _add_jobs(cfg, jobs, sources, requests, src_file, src_file.read_text(encoding="utf-8"),
+                  _prompt, {"temperature": 0.1, "max_tokens": 8192})
+
+    return _run_and_save(cfg, jobs, sources, archive_dir, on_saved=on_saved, requests=requests)
         
-def refactor_tests_zeroshot(cfg: ProjectConfig, archive_dir: Path | None = None) -> None:
+def refactor_tests_zeroshot(cfg: ProjectConfig, archive_dir: Path | None = None,
+                            only: Collection[str | Path] | None = None,
+                            on_saved: Callable[[Path], None] | None = None) -> List[Path]:
     """
     Zero-shot refactoring without smell detection or guides.
     Simply asks the LLM to remove test smells and refactor the code.
+    `only` restricts the run to those test files (see `_test_sources`); `on_saved` is called
+    with each source file right after its refactored version is written.
     """
-    for src_file in cfg.generated_test_dir.rglob("*.java"):
-        if "scaffolding" in src_file.name.lower():
-            continue
+    jobs: List[LLMJob] = []
+    sources: Dict[str, Path] = {}
+    requests: Dict[str, tuple[str, LLMJob]] = {}
+    for src_file in _test_sources(cfg, only):
         print(f"[LLM] zero-shot refactoring {src_file.name}...")
         
-        prompt = ZEROSHOT_PROMPT.format(
-            TEST_SOURCE=src_file.read_text(encoding="utf-8")
-        )
-        
-        resp = openai.chat.completions.create(
-            model=cfg.openai_model,
-            messages=[{"role":"system","content":SYSTEM_PROMPT},
-                      {"role":"user","content":prompt}],
-            # temperature=0.1, max_tokens=8192,
-            max_completion_tokens=8192,
-        )
-        improved = resp.choices[0].message.content.strip()
-
-        # Preserve original sub‑package folder when saving
-        rel_path = src_file.relative_to(cfg.generated_test_dir)
-        out_path = cfg.refactored_test_dir / rel_path
-        out_path.parent.mkdir(parents=True, exist_ok=True)
+        # temperature=0.1, max_tokens=8192,
+        _add_jobs(cfg, jobs, sources, requests, src_file, src_file.read_text(encoding="utf-8"),
+                  lambda source: ZEROSHOT_PROMPT.format(TEST_SOURCE=source),
+                  {"max_completion_tokens": 8192})
 
-        out_path.write_text(improved, encoding="utf-8")
-        
-        # ----- archive per-round -----
-        if archive_dir is not None:
-            archive_path = archive_dir / rel_path
-            archive_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(out_path, archive_path)
-            
-        print(f"[LLM] saved → {out_path}")
+    return _run_and_save(cfg, jobs, sources, archive_dir, on_saved=on_saved, requests=requests)
 
-def fix_compile_errors(cfg: ProjectConfig, compile_errors: str, archive_dir: Path | None = None) -> None:
+def fix_compile_errors(cfg: ProjectConfig, compile_errors: str,
+                       archive_dir: Path | None = None,
+                       only: Collection[str | Path] | None = None) -> List[Path]:
     """
     Fix compilation errors by sending error logs to LLM for correction.
+    The build log is split per file; each prompt carries only that file's
+    errors plus surrounding source lines. Only if no error could be parsed
+    from the log at all (unrecognised format) does a file mentioned in it
+    get the whole log instead.
+    `only` restricts fixing to those test files (see `_test_sources`).
     """
-    for src_file in cfg.generated_test_dir.rglob("*.java"):
-        if "scaffolding" in src_file.name.lower():
-            continue
-        
-        # Check if this file is mentioned in the compile errors
-        if src_file.name not in compile_errors:
+    diagnostics = parse_build_log(compile_errors)
+    # the log may quote the build command, which names every compiled file
+    parsed = any(d.severity == "error" for items in diagnostics.values() for d in items)
+    jobs: List[LLMJob] = []
+    sources: Dict[str, Path] = {}
+    requests: Dict[str, tuple[str, LLMJob]] = {}
+    for src_file in _test_sources(cfg, only):
+        source = src_file.read_text(encoding="utf-8")
+        own = diagnostics_for(diagnostics, src_file, cfg.generated_test_dir)
+        if own:
+            errors_text = format_diagnostics(own, source)
+        # Unparsed log: check if this file is mentioned in the compile errors
+        elif not parsed and src_file.name in compile_errors:
+            errors_text = compile_errors
+        else:
             continue
             
         print(f"[LLM] fixing compile errors in {src_file.name}...")
         
         prompt = COMPILE_ERROR_PROMPT.format(
-            COMPILE_ERRORS=compile_errors,
-            TEST_SOURCE=src_file.read_text(encoding="utf-8")
+            COMPILE_ERRORS=errors_text,
+            TEST_SOURCE=source
         )
-        
-        resp = openai.chat.completions.create(
-            model=cfg.openai_model,
-            messages=[{"role":"system","content":SYSTEM_PROMPT},
-                      {"role":"user","content":prompt}],
-            max_completion_tokens=8192,
-        )
-        improved = resp.choices[0].message.content.strip()
-
-        # Preserve original sub‑package folder when saving
-        rel_path = src_file.relative_to(cfg.generated_test_dir)
-        out_path = cfg.refactored_test_dir / rel_path
-        out_path.parent.mkdir(parents=True, exist_ok=True)
+        key = src_file.relative_to(cfg.generated_test_dir).as_posix()
+        job, full = _make_job(cfg, key, prompt, {"max_completion_tokens": 8192})
+        if not _within_budget(cfg, job):
+            print(f"  ↳ SKIPPED: {_tokens_msg(job.input_tokens)} exceeds the "
+                  f"{cfg.llm_max_input_tokens}-token budget")
+            continue
+        jobs.append(job)
+        sources[key] = src_file
+        requests[key] = (source, full)
 
-        out_path.write_text(improved, encoding="utf-8")
-        
-        # ----- archive per-round -----
-        if archive_dir is not None:
-            archive_path = archive_dir / rel_path
-            archive_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(out_path, archive_path)
-            
-        print(f"[LLM] saved fixed code → {out_path}")
\ No newline at end of file
+    return _run_and_save(cfg, jobs, sources, archive_dir, saved_msg="saved fixed code",
+                         requests=requests)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+# NOTE: stdlib-only on purpose — imported both as `TSGen.metrics` (pipeline)
+# and as top-level `metrics` (coverage_runner.py is run as a script).
+
+class Recorder:
+    """
+    Collects timing spans for one run and appends each as a JSON line to
+    `path`. Spans of the current run are also kept in memory for `print_summary`.
+    """
+
+    def __init__(self, path: Path, run_id: str):
+        self.path = path
+        self.run_id = run_id
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def record(self, span: dict) -> None:
+        span = {"run": self.run_id, **span}
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self.spans.append(span)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    @contextmanager
+    def span(self, stage: str, **attrs) -> Iterator[dict]:
+        """
+        Time a block. The yielded dict can be filled with extra fields
+        (tokens, bytes_in/out, exit_code, …) before the block ends.
+        """
+        fields: dict = dict(attrs)
+        start_wall, start = time.time(), time.perf_counter()
+        status = "ok"
+        try:
+            yield fields
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.record({"stage": stage, "start": round(start_wall, 3),
+                         "duration": round(time.perf_counter() - start, 4),
+                         "status": fields.pop("status", status), **fields})
+
+    def print_summary(self, top: int = 10) -> None:
+        if not self.spans:
+            return
+        by_stage: Dict[str, List[float]] = {}
+        for s in self.spans:
+            by_stage.setdefault(s["stage"], []).append(s["duration"])
+        print(f"[Metrics] Stages (spans → {self.path})")
+        print(f"    {'stage':<22}{'count':>7}{'total s':>11}{'max s':>10}")
+        for stage, ds in sorted(by_stage.items(), key=lambda kv: -sum(kv[1])):
+            print(f"    {stage:<22}{len(ds):>7}{sum(ds):>11.1f}{max(ds):>10.1f}")
+
+        llm = [s for s in self.spans if "prompt_tokens" in s]
+        if llm:
+            prompt = sum(s["prompt_tokens"] for s in llm)
+            cached = sum(s.get("cached_prompt_tokens", 0) for s in llm)
+            print(f"[Metrics] LLM tokens: prompt {prompt} ({cached} served from the provider's "
+                  f"prompt cache), completion {sum(s.get('completion_tokens', 0) for s in llm)}")
+
+        per_file = [s for s in self.spans if s.get("file")]
+        if per_file:
+            print(f"[Metrics] Slowest {min(top, len(per_file))} file-level spans")
+            for s in sorted(per_file, key=lambda s: -s["duration"])[:top]:
+                extra = ""
+                if "prompt_tokens" in s:
+                    extra = f"  tokens {s.get('prompt_tokens', 0)}+{s.get('completion_tokens', 0)}"
+                print(f"    {s['duration']:>8.1f}s  {s['stage']:<16} {s['file']}{extra}")
+
+
+_recorders: Dict[Path, Recorder] = {}
+_lock = threading.Lock()
+
+def start_run(cfg) -> Recorder:
+    """Begin a new run for `cfg.result_dir` (spans append to metrics.jsonl)."""
+    path = cfg.result_dir / "metrics.jsonl"
+    rec = Recorder(path, time.strftime("%Y%m%d_%H%M%S"))
+    with _lock:
+        _recorders[path.resolve()] = rec
+    return rec
+
+def recorder(cfg) -> Recorder:
+    path = cfg.result_dir / "metrics.jsonl"
+    with _lock:
+        rec = _recorders.get(path.resolve())
+    return rec or start_run(cfg)
+
+def span(cfg, stage: str, **attrs):
+    return recorder(cfg).span(stage, **attrs)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable, List
+
+class PatchError(ValueError):
+    """An edit could not be parsed or does not apply cleanly."""
+
+@dataclass
+class Edit:
+    search: List[str]           # lines to find (without line endings)
+    replace: List[str]          # lines to put in their place
+
+# ── parsing ─────────────────────────────────────────────────────────────
+_FENCE_RE = re.compile(r"^\s*```")
+_SEARCH_RE = re.compile(r"^\s*<{5,9}\s*SEARCH\s*$")
+_DIVIDER_RE = re.compile(r"^\s*={5,9}\s*$")
+_REPLACE_RE = re.compile(r"^\s*>{5,9}\s*REPLACE\s*$")
+
+def parse_search_replace(text: str) -> List[Edit]:
+    """
+    Parse SEARCH/REPLACE blocks:
+
+        <<<<<<< SEARCH
+        old lines
+        =======
+        new lines
+        >>>>>>> REPLACE
+    """
+    edits: List[Edit] = []
+    state, search, replace = None, [], []
+    for line in text.splitlines():
+        if state is None:
+            if _SEARCH_RE.match(line):
+                state, search, replace = "search", [], []
+        elif state == "search":
+            if _DIVIDER_RE.match(line):
+                state = "replace"
+            else:
+                search.append(line)
+        elif _REPLACE_RE.match(line):
+            edits.append(Edit(search, replace))
+            state = None
+        else:
+            replace.append(line)
+    if state is not None:
+        raise PatchError("unterminated SEARCH/REPLACE block")
+    return edits
+
+def _file_header(lines: List[str], i: int) -> bool:
+    """Does a new file's header start at lines[i]? (`diff --git`, or `--- `/`+++ ` then `@@`)"""
+    if lines[i].startswith("diff --git "):
+        return True
+    return (lines[i].startswith("--- ") and i + 1 < len(lines)
+            and lines[i + 1].startswith("+++ ")
+            and (i + 2 == len(lines) or lines[i + 2].startswith("@@")))
+
+def parse_unified_diff(text: str) -> List[Edit]:
+    """
+    Turn every `@@` hunk of a unified diff into an Edit (context + removed →
+    context + added). Inside a hunk, `--- x`-style lines are removed/added
+    code; only a full file header (or a fence) ends it.
+    """
+    edits: List[Edit] = []
+    hunk: Edit | None = None
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("@@"):
+            if hunk is not None:
+                edits.append(hunk)
+            hunk = Edit([], [])
+        elif hunk is None:
+            continue                    # file headers, prose before the first hunk
+        elif _file_header(lines, i) or _FENCE_RE.match(line):
+            edits.append(hunk)
+            hunk = None
+        elif line.startswith("\\"):
+            continue                    # "\ No newline at end of file"
+        elif line.startswith("-"):
+            hunk.search.append(line[1:])
+        elif line.startswith("+"):
+            hunk.replace.append(line[1:])
+        else:
+            # context; models often drop the leading space on blank lines
+            hunk.search.append(line[1:] if line.startswith(" ") else line)
+            hunk.replace.append(line[1:] if line.startswith(" ") else line)
+    if hunk is not None:
+        edits.append(hunk)
+    return [e for e in edits if e.search != e.replace]
+
+def parse_edits(text: str) -> List[Edit]:
+    """SEARCH/REPLACE blocks if there are any, otherwise unified-diff hunks."""
+    return parse_search_replace(text) or parse_unified_diff(text)
+
+# ── applying ────────────────────────────────────────────────────────────
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+def _find(lines: List[str], search: List[str], norm: Callable[[str], str]) -> List[int]:
+    target = [norm(s) for s in search]
+    k = len(target)
+    return [i for i in range(len(lines) - k + 1)
+            if [norm(l) for l in lines[i:i + k]] == target]
+
+def apply_edits(source: str, edits: List[Edit]) -> str:
+    """
+    Apply `edits` in order. Each SEARCH must match exactly one place, tried
+    exactly, then ignoring trailing whitespace, then ignoring indentation
+    (the replacement is re-indented to match). Raises PatchError otherwise.
+    """
+    lines = source.split("\n")
+    for n, edit in enumerate(edits, 1):
+        search, replace = edit.search, edit.replace
+        # surrounding blank lines are too weak an anchor to require; drop as
+        # many blank lines from the replacement so none are added either
+        while search and not search[0].strip():
+            search = search[1:]
+            if replace and not replace[0].strip():
+                replace = replace[1:]
+        while search and not search[-1].strip():
+            search = search[:-1]
+            if replace and not replace[-1].strip():
+                replace = replace[:-1]
+        if not search:
+            raise PatchError(f"edit {n}: empty SEARCH section")
+        for norm in (lambda s: s, str.rstrip, str.strip):
+            hits = _find(lines, search, norm)
+            if hits:
+                break
+        if not hits:
+            raise PatchError(f"edit {n}: SEARCH text not found: {search[0].strip()!r}")
+        if len(hits) > 1:
+            raise PatchError(f"edit {n}: SEARCH text matches {len(hits)} places: "
+                             f"{search[0].strip()!r}")
+        start = hits[0]
+        src_indent, search_indent = _indent(lines[start]), _indent(search[0])
+        if src_indent != search_indent:
+            replace = [src_indent + r[len(search_indent):] if r.startswith(search_indent) else r
+                       for r in replace]
+        lines[start:start + len(search)] = replace
+    return "\n".join(lines)
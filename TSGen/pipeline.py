@@ -1,21 +1,31 @@
 from __future__ import annotations
+import queue
+import threading
 import time
 import shutil
+import traceback
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
 from typing import List, Dict
 
+from . import metrics
+from .checkpoint import Checkpoint, GENERATED, BASELINE, DETECTED, VERIFIED
 from .config import ProjectConfig
 from .evo import generate_tests
-from .tsdetect import run_tsdetect, smell_counts_from_csv, get_test_methods_count
+from .tsdetect import detect_batch, SmellCache
 from .llm_refactor import refactor_tests, refactor_tests_zeroshot, fix_compile_errors
-from .compiler import compile_and_test
+from .compiler import compile_and_test, fast_verify
 
 # ── utility: pretty‑print smell summary ──────────────────────────────────
-def _print_smell_summary(smells: Dict[str, Dict[str, int]], method_counts: Dict[str, int], phase: str) -> None:
+def _print_smell_summary(smells: Dict[str, Dict[str, int]], method_counts: Dict[str, int], phase: str,
+                         cache: SmellCache | None = None) -> None:
     total_smells = sum(sum(c for c in counts.values()) for counts in smells.values())
     total_methods = sum(method_counts.values())
     total_classes = len(method_counts)
     
     print(f"[TSDetect] {phase} - Test classes: {total_classes}, Test methods: {total_methods}, Smells: {total_smells}")
+    if cache is not None:
+        print(f"[TSDetect] Cache: {cache.hits} hits, {cache.misses} misses")
     print("[TSDetect] Method count by class:")
     for class_name, method_count in method_counts.items():
         print(f"    {class_name}: {method_count} methods")
@@ -28,77 +38,442 @@ def _print_smell_summary(smells: Dict[str, Dict[str, int]], method_counts: Dict[
                     print(f"    {s} × {n}")
 
 # ── 1단계: tsDetect → {testClass: [smell…]} ─────────────────────────────
-def detect_smells(cfg: ProjectConfig) -> tuple[Dict[str, Dict[str, int]], Dict[str, int]]:
+def detect_smells(cfg: ProjectConfig, cache: SmellCache | None = None,
+                  test_files: List[Path] | None = None
+                  ) -> tuple[Dict[str, Dict[str, int]], Dict[str, int]]:
     """
-    Run tsDetect on each test file and return:
+    Run tsDetect once over all test files (or just `test_files`) and return:
         ({TestClassFileName: {smellName: count, ...}, ...}, {TestClassFileName: methodCount, ...})
+    With a `cache`, files whose content (and production file / tsDetect jar)
+    is unchanged are served from it and only the rest are re-detected.
     """
+    if test_files is None:
+        test_files = [
+            f for f in sorted(cfg.generated_test_dir.rglob("*.java"))
+            # Skip EvoSuite scaffolding/helper classes
+            if "scaffolding" not in f.name.lower()
+        ]
+    if cache is None:
+        with metrics.span(cfg, "detect_smells", files=len(test_files)):
+            return detect_batch(cfg, cfg.project_name, test_files)
+
+    cache.reset_stats()
+    keys = {f: cache.key(f) for f in test_files}
+    cached = {f: cache.get(k) for f, k in keys.items()}
+    misses = [f for f, hit in cached.items() if hit is None]
+    with metrics.span(cfg, "detect_smells", files=len(test_files),
+                      cache_hits=cache.hits, cache_misses=cache.misses):
+        fresh_smells, fresh_methods = detect_batch(cfg, cfg.project_name, misses)
+    for f in misses:
+        if f.name in fresh_methods:
+            cache.put(keys[f], fresh_smells.get(f.name, {}), fresh_methods[f.name])
+    cache.save()
+
     smell_map: Dict[str, Dict[str, int]] = {}
     method_counts: Dict[str, int] = {}
-    
-    for test_file in cfg.generated_test_dir.rglob("*.java"):
-        # Skip EvoSuite scaffolding/helper classes
-        if "scaffolding" in test_file.name.lower():
+    for f in test_files:
+        if cached[f] is not None:
+            counts, methods = cached[f]
+        elif f.name in fresh_methods:
+            counts, methods = fresh_smells.get(f.name, {}), fresh_methods[f.name]
+        else:
             continue
-        csv_path = run_tsdetect(cfg, cfg.project_name, test_file)
-        counts = smell_counts_from_csv(csv_path)
-        methods_count = get_test_methods_count(csv_path)
-        
         if counts:
-            smell_map[test_file.name] = counts
-        method_counts[test_file.name] = methods_count
-    
+            smell_map[f.name] = counts
+        method_counts[f.name] = methods
     return smell_map, method_counts
 
+# ── 파일별 라운드 상태 ───────────────────────────────────────────────────
+PENDING, CLEAN, CONVERGED, FAILED = "pending", "clean", "converged", "failed"
+
+@dataclass
+class FileState:
+    """Per-test-file refactoring state carried across rounds."""
+    status: str = PENDING
+    rounds: int = 0                                   # LLM rounds spent on this file
+    smells: Dict[str, int] = field(default_factory=dict)
+    failures: int = 0                                 # rounds whose LLM call / compile failed
+
+def _mark_failed(st: FileState) -> None:
+    st.status = FAILED
+    st.failures += 1
+
+def _update_states(states: Dict[str, FileState], smells: Dict[str, Dict[str, int]],
+                   method_counts: Dict[str, int], max_failures: int) -> None:
+    """
+    pending   → still smelly and changed since last round (or never refactored),
+                or failed fewer than `max_failures` times so far
+    clean     → no smells left
+    converged → refactored, but the smell counts did not change
+    failed    → the LLM call / compile for this file failed `max_failures` times
+                (failures are counted by the round loop)
+    """
+    for name in method_counts:
+        active = {s: n for s, n in smells.get(name, {}).items() if n > 0}
+        st = states.setdefault(name, FileState())
+        if st.status == FAILED and st.failures >= max_failures:
+            pass
+        elif not active:
+            st.status = CLEAN
+        elif st.status != FAILED and st.rounds > 0 and active == st.smells:
+            st.status = CONVERGED
+        else:
+            st.status = PENDING
+        st.smells = active
+
+def _print_file_states(states: Dict[str, FileState]) -> None:
+    print("[Pipeline] Per-file status:")
+    for name, st in sorted(states.items()):
+        print(f"    {name}: {st.status} after {st.rounds} round(s)")
+
+def _states_to_json(states: Dict[str, FileState]) -> Dict[str, dict]:
+    return {name: asdict(st) for name, st in sorted(states.items())}
+
+def _states_from_json(files: Dict[str, dict]) -> Dict[str, FileState]:
+    return {name: FileState(**st) for name, st in files.items()}
+
+def _pipeline_result(cfg: ProjectConfig, status: str, rounds: int,
+                     states: Dict[str, FileState]) -> Dict[str, object]:
+    return {
+        "project": cfg.project_name,
+        "status": status,
+        "rounds": rounds,
+        "result_dir": str(cfg.result_dir),
+        "files": _states_to_json(states),
+    }
+
+def _finish_pipeline(cfg: ProjectConfig, rec: metrics.Recorder, ckpt: Checkpoint,
+                     states: Dict[str, FileState], round_: int) -> Dict[str, object]:
+    # 6) full clean build as the final gate for fast-verified rounds
+    if cfg.fast_verify and round_ > 0 and not ckpt.done(VERIFIED):
+        for attempt in range(1, cfg.max_compile_retries + 1):
+            print(f"[Compile] Final gate: full clean build (attempt {attempt})")
+            success, error_output = compile_and_test(cfg)
+            if success:
+                ckpt.mark(VERIFIED)
+                break
+            if error_output and attempt < cfg.max_compile_retries:
+                print("[Pipeline] Final full build failed, asking LLM to fix errors...")
+                error_fix_dir = cfg.result_dir / f"error_fix_final_attempt_{attempt}"
+                fix_compile_errors(cfg, error_output, archive_dir=error_fix_dir)
+        else:
+            print("[Pipeline] Final full build failed; abort.")
+            rec.print_summary()
+            return _pipeline_result(cfg, "compile_failed", round_, states)
+
+    _print_file_states(states)
+    rec.print_summary()
+    if any(st.status == PENDING for st in states.values()):
+        print("[Pipeline] Max rounds reached – smells remain.")
+        status = "max_rounds"
+    elif all(st.status == CLEAN for st in states.values()):
+        print("[Pipeline] Success – all smells removed!")
+        status = "success"
+    else:
+        stuck = sum(st.status != CLEAN for st in states.values())
+        print(f"[Pipeline] Stopped – {stuck} file(s) converged or failed with smells remaining.")
+        status = "stopped"
+    return _pipeline_result(cfg, status, round_, states)
+
+# ── 스트리밍 모드: 파일 단위 detect → LLM → compile ───────────────────────
+_DONE = object()    # queue sentinel
+
+def _stream_refactor(cfg: ProjectConfig, states: Dict[str, FileState],
+                     smell_cache: SmellCache, ckpt: Checkpoint) -> int:
+    """
+    Move each test file through detect → LLM refactor → compile check on its
+    own instead of finishing every stage for all files first. A file that
+    compiles goes back to detection, so every file runs its own rounds (up to
+    `cfg.max_refactor_rounds`), and the first refactored files are compiled
+    while others are still being detected or refactored.
+
+    The detect→LLM and LLM→compile queues hold at most `cfg.stream_queue_size`
+    files. The compile→detect queue is unbounded: it closes the cycle, and
+    bounding every edge of a cycle can deadlock. tsDetect runs on whatever is
+    queued, up to `cfg.llm_concurrency` files per JVM. A file that still fails
+    to compile after the fix attempts is restored to its previous version;
+    failed files go back to detection until `cfg.max_file_failures` is hit.
+    Returns the largest number of rounds spent on any file.
+    """
+    files = [f for f in sorted(cfg.generated_test_dir.rglob("*.java"))
+             if "scaffolding" not in f.name.lower()
+             and states.get(f.name, FileState()).status == PENDING]
+    if not files:
+        return max((st.rounds for st in states.values()), default=0)
+    if not ckpt.resumed:
+        for d in cfg.result_dir.glob("refactor_round_*"):
+            shutil.rmtree(d)
+    ckpt.clear(VERIFIED)
+
+    workers = max(1, cfg.llm_concurrency)
+    detect_q: queue.Queue = queue.Queue()
+    refactor_q: queue.Queue = queue.Queue(maxsize=cfg.stream_queue_size)
+    compile_q: queue.Queue = queue.Queue(maxsize=cfg.stream_queue_size)
+    lock = threading.Lock()
+    outstanding = len(files)
+
+    def _finish(name: str, status: str | None = None) -> None:
+        """`name` leaves the stream; the last file out stops every worker."""
+        nonlocal outstanding
+        with lock:
+            if status is not None:
+                states.setdefault(name, FileState()).status = status
+            ckpt.set_files(_states_to_json(states))
+            outstanding -= 1
+            last = outstanding == 0
+        if last:
+            detect_q.put(_DONE)
+            for _ in range(workers):
+                refactor_q.put(_DONE)
+            compile_q.put(_DONE)
+
+    def _detect_worker() -> None:
+        while (f := detect_q.get()) is not _DONE:
+            batch = [f]
+            while len(batch) < workers:
+                try:
+                    batch.append(detect_q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                smells, method_counts = detect_smells(cfg, smell_cache, batch)
+            except Exception:
+                traceback.print_exc()
+                for f in batch:
+                    with lock:
+                        _mark_failed(states.setdefault(f.name, FileState()))
+                    _finish(f.name)
+                continue
+            for f in batch:
+                if f.name not in method_counts:
+                    _finish(f.name)
+                    continue
+                with lock:
+                    _update_states(states, smells, {f.name: method_counts[f.name]},
+                                   cfg.max_file_failures)
+                    st = states[f.name]
+                    more = st.status == PENDING and st.rounds < cfg.max_refactor_rounds
+                print(f"[Stream] {f.name}: {st.status}, {sum(st.smells.values())} smell(s) "
+                      f"after {st.rounds} round(s)")
+                if more:
+                    refactor_q.put(f)
+                else:
+                    _finish(f.name)
+
+    def _failed(f: Path) -> None:
+        """Count a failed attempt; the file goes back to detection while it has retries left."""
+        with lock:
+            st = states[f.name]
+            _mark_failed(st)
+            retry = st.failures < cfg.max_file_failures and st.rounds < cfg.max_refactor_rounds
+        if retry:
+            print(f"[Stream] {f.name}: failed attempt {st.failures}; will retry.")
+            detect_q.put(f)
+        else:
+            _finish(f.name)
+
+    def _refactor_worker() -> None:
+        while (f := refactor_q.get()) is not _DONE:
+            with lock:
+                n = states[f.name].rounds + 1
+                states[f.name].rounds = n
+            try:
+                original = f.read_text(encoding="utf-8")
+                saved = refactor_tests_zeroshot(cfg, archive_dir=cfg.result_dir / f"refactor_round_{n}",
+                                                only=[f])
+            except Exception:
+                traceback.print_exc()
+                saved = []
+            if saved:
+                compile_q.put((f, n, original))
+            else:
+                _failed(f)
+
+    def _compile_worker() -> None:
+        while (item := compile_q.get()) is not _DONE:
+            f, n, original = item
+            success = False
+            try:
+                for attempt in range(1, cfg.max_compile_retries + 1):
+                    if cfg.fast_verify:
+                        success, error_output, _ = fast_verify(cfg, [f])
+                    else:
+                        # only `f`: other queued files are not verified yet
+                        success, error_output = compile_and_test(cfg, only=[f])
+                    if success or not error_output or attempt == cfg.max_compile_retries:
+                        break
+                    print(f"[Stream] {f.name}: compile failed, asking LLM to fix errors...")
+                    fix_compile_errors(cfg, error_output, only=[f],
+                                       archive_dir=cfg.result_dir / f"error_fix_round_{n}_attempt_{attempt}")
+            except Exception:
+                traceback.print_exc()
+            if success:
+                detect_q.put(f)
+                continue
+            print(f"[Stream] {f.name}: compile failed; restoring its previous version.")
+            rel = f.relative_to(cfg.generated_test_dir)
+            for path in (f, cfg.refactored_test_dir / rel):
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(original, encoding="utf-8")
+            _failed(f)
+
+    print(f"\n===== STREAMING REFACTOR ({len(files)} files, {workers} LLM workers) =====")
+    owner = threading.current_thread().name     # keeps batch output attributable
+    threads = [threading.Thread(target=_detect_worker, name=f"{owner}/stream-detect"),
+               threading.Thread(target=_compile_worker, name=f"{owner}/stream-compile")]
+    threads += [threading.Thread(target=_refactor_worker, name=f"{owner}/stream-llm-{i}")
+                for i in range(workers)]
+    for f in files:
+        detect_q.put(f)
+    with metrics.span(cfg, "stream", files=len(files)):
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return max((st.rounds for st in states.values()), default=0)
+
 # ── 2단계: 단일 프로젝트 파이프라인 ──────────────────────────────────────
 def run_pipeline(project_name: str,
-                 target_classes: List[str] | None = None) -> None:
-    cfg = ProjectConfig(project_name)
+                 target_classes: List[str] | None = None,
+                 llm_cache_mode: str = "use",
+                 evosuite_workers: int = 1,
+                 regenerate: bool = False,
+                 resume: bool = False,
+                 streaming: bool = False,
+                 chunk_tokens: int = 0,
+                 llm_backend: str = "sync",
+                 edit_format: str = "whole") -> Dict[str, object]:
+    """
+    Run the whole pipeline for one project; returns a JSON-able result summary.
+    Progress is checkpointed after every stage and refactored file; with
+    `resume`, completed work is skipped and the open round is continued.
+    With `streaming`, files move through detect → refactor → compile one by
+    one (see `_stream_refactor`) instead of in stage-wide rounds.
+    `chunk_tokens` > 0 refactors large test classes in @Test-method chunks.
+    `llm_backend="batch"` sends each round's prompts as one Batch API job
+    (not with `streaming`, which would submit one batch per file).
+    `edit_format` "search_replace" / "udiff" asks the LLM for edits instead
+    of whole files (falling back to a whole file when they do not apply).
+    """
+    if streaming and llm_backend == "batch":
+        raise ValueError("streaming sends one file at a time; use the sync LLM backend")
+    cfg = ProjectConfig(project_name, llm_cache_mode=llm_cache_mode,
+                        evosuite_workers=evosuite_workers,
+                        evosuite_incremental=not regenerate,
+                        llm_chunk_tokens=chunk_tokens,
+                        llm_backend=llm_backend,
+                        llm_edit_format=edit_format)
     cfg.ensure_dirs()
+    rec = metrics.start_run(cfg)
+    ckpt = Checkpoint(cfg, resume=resume, target_classes=target_classes)
 
     # 1) EvoSuite
-    generate_tests(cfg, target_classes=target_classes)
+    if ckpt.done(GENERATED):
+        print("[Checkpoint] EvoSuite tests already generated; skip.")
+    else:
+        with rec.span("evosuite"):
+            generate_tests(cfg, target_classes=target_classes)
+        ckpt.mark(GENERATED)
     
     #TODO: --- copy baseline tests ---
     baseline_dir = cfg.result_dir / "baseline_tests"
-    if baseline_dir.exists():
-        shutil.rmtree(baseline_dir)
-    shutil.copytree(cfg.generated_test_dir, baseline_dir)
+    if ckpt.done(BASELINE) and baseline_dir.is_dir():
+        print("[Checkpoint] Baseline tests already saved; keep.")
+    else:
+        if baseline_dir.exists():
+            shutil.rmtree(baseline_dir)
+        shutil.copytree(cfg.generated_test_dir, baseline_dir)
+        ckpt.mark(BASELINE)
 
     # 2) smell detect
-    smells, method_counts = detect_smells(cfg)
-    
-    _print_smell_summary(smells, method_counts, "Detected")
+    smell_cache = SmellCache(cfg)
+    if streaming:
+        states = _states_from_json(ckpt.files)
+        round_ = _stream_refactor(cfg, states, smell_cache, ckpt)
+        return _finish_pipeline(cfg, rec, ckpt, states, round_)
+    if ckpt.done(DETECTED):
+        states = _states_from_json(ckpt.files)
+        smells = {name: dict(st.smells) for name, st in states.items() if st.smells}
+        print(f"[Checkpoint] Resuming after round {ckpt.rounds} "
+              f"({sum(st.status == PENDING for st in states.values())} files pending).")
+    else:
+        smells, method_counts = detect_smells(cfg, smell_cache)
+        
+        _print_smell_summary(smells, method_counts, "Detected", smell_cache)
 
-    round_ = 0
-    while smells and round_ < cfg.max_refactor_rounds:
-        round_ += 1
-        print(f"\n===== REFACTOR ROUND {round_} =====")
+        states: Dict[str, FileState] = {}
+        _update_states(states, smells, method_counts, cfg.max_file_failures)
+        ckpt.set_files(_states_to_json(states))
+        ckpt.mark(DETECTED)
+
+    round_ = ckpt.rounds
+    while True:
+        rnd = ckpt.open_round
+        if rnd is None:
+            todo = {name for name, st in states.items() if st.status == PENDING}
+            if not todo or round_ >= cfg.max_refactor_rounds:
+                break
+            round_ += 1
+            ckpt.clear(VERIFIED)
+            rnd = ckpt.begin_round(round_, sorted(todo))
+            print(f"\n===== REFACTOR ROUND {round_} ({len(todo)} files) =====")
+        else:
+            todo = set(rnd["todo"])
+            print(f"\n===== REFACTOR ROUND {round_} (resumed, "
+                  f"{len(rnd['refactored'])}/{len(todo)} files refactored) =====")
 
         # 3) LLM refactor
         # Convert {smell: count} → list[str] for LLM prompt
         llm_smell_map = {
             cls: [s for s, n in counts.items() if n > 0]
-            for cls, counts in smells.items()
+            for cls, counts in smells.items() if cls in todo
         }
         
         #TODO: Archive previous round
         round_dir = cfg.result_dir / f"refactor_round_{round_}"
-        if round_dir.exists():
+        if round_dir.exists() and not rnd["refactored"]:
             shutil.rmtree(round_dir)
         # refactor_tests(cfg, llm_smell_map, archive_dir=round_dir)
         
         #TODO: Archive zero-shot refactor
-        refactor_tests_zeroshot(cfg, archive_dir=round_dir)
+        if not rnd["refactor_done"]:
+            remaining = todo - set(rnd["refactored"])
+            with rec.span("refactor_round", round=round_, files=len(remaining)):
+                refactor_tests_zeroshot(cfg, archive_dir=round_dir, only=remaining,
+                                        on_saved=ckpt.file_refactored)
+            done = set(rnd["refactored"])
+            for name in todo:
+                states[name].rounds += 1
+                if name not in done:
+                    _mark_failed(states[name])
+            ckpt.round_step("refactor_done", _states_to_json(states))
+        done = set(rnd["refactored"])
+        if not done:
+            print("[Pipeline] No file was refactored this round; skip compile.")
+            # nothing changed on disk: the known smells still hold, and files
+            # with retries left go back to pending
+            _update_states(states, smells, dict.fromkeys(todo, 0), cfg.max_file_failures)
+            ckpt.close_round(_states_to_json(states))
+            continue
+        refactored = [f for f in sorted(cfg.generated_test_dir.rglob("*.java"))
+                      if f.name in done]
 
         # 4) compile + test with error fixing
-        compile_success = False
+        compile_success = rnd["compiled"]
+        if compile_success:
+            print("[Checkpoint] Round already compiled; skip.")
         for attempt in range(1, cfg.max_compile_retries + 1):
+            if compile_success:
+                break
             print(f"[Compile] Attempt {attempt}")
-            success, error_output = compile_and_test(cfg)
+            if cfg.fast_verify:
+                success, error_output, _ = fast_verify(cfg, refactored)
+            else:
+                success, error_output = compile_and_test(cfg)
             
             if success:
                 compile_success = True
+                ckpt.round_step("compiled")
                 break
             elif error_output and attempt < cfg.max_compile_retries:
                 # Try to fix compile errors with LLM
@@ -112,16 +487,16 @@ def run_pipeline(project_name: str,
         
         if not compile_success:
             print("[Pipeline] All compile attempts failed; abort.")
-            return
+            rec.print_summary()
+            return _pipeline_result(cfg, "compile_failed", round_, states)
 
         # 5) re-detect smells
-        smells, method_counts = detect_smells(cfg)
-        _print_smell_summary(smells, method_counts, "Remaining")
+        smells, method_counts = detect_smells(cfg, smell_cache)
+        _print_smell_summary(smells, method_counts, "Remaining", smell_cache)
+        _update_states(states, smells, method_counts, cfg.max_file_failures)
+        ckpt.close_round(_states_to_json(states))
 
-    if smells:
-        print("[Pipeline] Max rounds reached – smells remain.")
-    else:
-        print("[Pipeline] Success – all smells removed!")
+    return _finish_pipeline(cfg, rec, ckpt, states, round_)
 
 # ── CLI ─────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
@@ -131,5 +506,35 @@ if __name__ == "__main__":
     parser.add_argument(
         "-c", "--class", dest="classes", action="append",
         help="Fully-qualified target class (repeatable). If omitted, all classes.")
+    parser.add_argument(
+        "--llm-cache", choices=("use", "refresh", "off"), default="use",
+        help="LLM response cache: use (default), refresh (ignore hits, overwrite), off (bypass).")
+    parser.add_argument(
+        "-j", "--evosuite-workers", type=int, default=1,
+        help="Concurrent EvoSuite JVMs (one class each). Default 1.")
+    parser.add_argument(
+        "--regenerate", action="store_true",
+        help="Regenerate EvoSuite tests for all classes, even unchanged ones.")
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue from results/<project>/checkpoint.json, skipping completed stages and files.")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Stream files through detect → LLM → compile one by one instead of stage-wide rounds.")
+    parser.add_argument(
+        "--chunk-tokens", type=int, default=0,
+        help="Refactor test classes larger than N tokens in concurrent @Test-method chunks (0 = off).")
+    parser.add_argument(
+        "--llm-backend", choices=("sync", "batch"), default="sync",
+        help="sync: concurrent chat completions (default); batch: one Batch API job per round.")
+    parser.add_argument(
+        "--edit-format", choices=("whole", "search_replace", "udiff"), default="whole",
+        help="Ask the LLM for whole files (default) or for edits applied locally.")
     args = parser.parse_args()
-    run_pipeline(project_name=args.project, target_classes=args.classes)
\ No newline at end of file
+    if args.stream and args.llm_backend == "batch":
+        parser.error("--stream cannot be combined with --llm-backend batch")
+    run_pipeline(project_name=args.project, target_classes=args.classes,
+                 llm_cache_mode=args.llm_cache, evosuite_workers=args.evosuite_workers,
+                 regenerate=args.regenerate, resume=args.resume, streaming=args.stream,
+                 chunk_tokens=args.chunk_tokens, llm_backend=args.llm_backend,
+                 edit_format=args.edit_format)
\ No newline at end of file
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+# tiktoken is optional: without it, counts fall back to ~4 characters per token
+try:
+    import tiktoken
+except ImportError:                     # pragma: no cover - depends on the environment
+    tiktoken = None
+
+ENCODING = "o200k_base"                 # o-series / GPT-4o tokenizer
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(ENCODING)
+    except Exception:                   # encoding files unavailable offline
+        return None
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` (exact with tiktoken, otherwise len/4)."""
+    enc = _encoding()
+    if enc is None:
+        return len(text) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+def exact() -> bool:
+    """True if `count_tokens` uses the real tokenizer rather than the len/4 estimate."""
+    return _encoding() is not None
@@ -1,7 +1,7 @@
 from __future__ import annotations
-import csv, tempfile
+import csv, hashlib, json, tempfile
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from .config import ProjectConfig
 from .utils import run_cmd
 
@@ -51,10 +51,67 @@ def run_tsdetect(cfg: ProjectConfig, project: str, test_file: Path,
     out_csv = cfg.result_dir / f"{test_file.stem}_smells.csv"
     cmd = ["java", "-jar", str(cfg.tsdetect_jar.resolve()),
            "-f", str(list_csv), "-g", "numerical", "-o", str(out_csv)]
-    run_cmd(cmd)
+    run_cmd(cmd, log_file=cfg.logs_dir / "tsdetect.log", tail_lines=200)
     list_csv.unlink(missing_ok=True)
     return out_csv
 
+def run_tsdetect_batch(cfg: ProjectConfig, project: str,
+                       test_files: List[Path]) -> Path:
+    """
+    Run tsDetect (numerical mode) once over many test files → return output CSV path.
+    Every (test, production) pair goes into one list CSV so the whole batch
+    costs a single JVM start instead of one per test file.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".csv", text=True)
+    list_csv = Path(tmp_path)
+    with open(fd, "w", newline="") as tf:
+        writer = csv.writer(tf)
+        for test_file in test_files:
+            production_file = _infer_production_file(cfg, test_file)
+            writer.writerow(
+                [project, str(test_file.resolve()),
+                 str(production_file.resolve()) if production_file else ""]
+            )
+
+    out_csv = cfg.result_dir / f"{project}_batch_smells.csv"
+    cmd = ["java", "-jar", str(cfg.tsdetect_jar.resolve()),
+           "-f", str(list_csv), "-g", "numerical", "-o", str(out_csv)]
+    try:
+        run_cmd(cmd, log_file=cfg.logs_dir / "tsdetect.log", tail_lines=200)
+    finally:
+        list_csv.unlink(missing_ok=True)
+    return out_csv
+
+def detect_batch(cfg: ProjectConfig, project: str, test_files: List[Path]
+                 ) -> Tuple[Dict[str, Dict[str, int]], Dict[str, int]]:
+    """
+    Batch counterpart of `run_tsdetect` + `smell_counts_from_csv` +
+    `get_test_methods_count`. Returns:
+        ({TestClassFileName: {smellName: count, ...}, ...}, {TestClassFileName: methodCount, ...})
+    """
+    smell_map: Dict[str, Dict[str, int]] = {}
+    method_counts: Dict[str, int] = {}
+    if not test_files:
+        return smell_map, method_counts
+
+    csv_path = run_tsdetect_batch(cfg, project, test_files)
+    rows: Dict[str, Dict[str, str]] = {}
+    with csv_path.open(newline="") as f:
+        for row in csv.DictReader(f):
+            rows[str(Path(row.get("TestFilePath", "")).resolve())] = row
+
+    # Keep the input order so summaries look the same as the per-file path
+    for test_file in test_files:
+        row = rows.get(str(test_file.resolve()))
+        if row is None:
+            print(f"[TSDetect] WARNING: no result for {test_file.name}")
+            continue
+        counts = {k: int(v) for k, v in row.items() if k not in META}
+        if counts:
+            smell_map[test_file.name] = counts
+        method_counts[test_file.name] = int(row.get("NumberOfMethods", 0))
+    return smell_map, method_counts
+
 def smell_counts_from_csv(path: Path) -> Dict[str, int]:
     with path.open(newline="") as f:
         row = next(csv.DictReader(f))
@@ -64,4 +121,58 @@ def get_test_methods_count(path: Path) -> int:
     """Extract NumberOfMethods from tsDetect CSV output"""
     with path.open(newline="") as f:
         row = next(csv.DictReader(f))
-    return int(row.get("NumberOfMethods", 0))
\ No newline at end of file
+    return int(row.get("NumberOfMethods", 0))
+
+# ── persistent smell cache ──────────────────────────────────────────────
+def _sha256_file(path: Path | None) -> str:
+    if path is None or not path.is_file():
+        return ""
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class SmellCache:
+    """
+    tsDetect results keyed by sha256(test file) + sha256(production file) +
+    sha256(TestSmellDetector.jar), persisted as JSON under `cfg.result_dir`.
+    `hits` / `misses` count lookups since the last `reset_stats()`.
+    """
+
+    def __init__(self, cfg: ProjectConfig):
+        self.cfg = cfg
+        self.path = cfg.result_dir / "smell_cache.json"
+        self.jar_version = _sha256_file(cfg.tsdetect_jar.resolve())
+        self.hits = 0
+        self.misses = 0
+        try:
+            self.entries: Dict[str, dict] = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def key(self, test_file: Path) -> str:
+        production_file = _infer_production_file(self.cfg, test_file)
+        raw = "|".join((_sha256_file(test_file), _sha256_file(production_file),
+                        self.jar_version))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> Tuple[Dict[str, int], int] | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["counts"], entry["methods"]
+
+    def put(self, key: str, counts: Dict[str, int], methods: int) -> None:
+        self.entries[key] = {"counts": counts, "methods": methods}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = 0
@@ -1,22 +1,189 @@
 from __future__ import annotations
 
+import os
+import signal
 import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Sequence
+from typing import Callable, Sequence
+
+
+@dataclass
+class CommandResult:
+    cmd: Sequence[str] | str
+    returncode: int
+    stdout: str
+    stderr: str
+    elapsed: float               # wall-clock seconds
+    max_rss_kb: int              # peak resident set size of the child (0 if unknown)
+    timed_out: bool = False
+
+
+# ── global CPU budget ─────────────────────────────────────────────────────
+# Every external command (JVMs, builds) holds one slot while it runs, so
+# concurrent projects share the machine; LLM calls never take a slot.
+_cpu_slots: threading.BoundedSemaphore | None = None
+
+
+def set_cpu_budget(slots: int | None) -> None:
+    """Limit concurrently running external commands to `slots` (None = unlimited)."""
+    global _cpu_slots
+    _cpu_slots = threading.BoundedSemaphore(slots) if slots else None
 
 
 class CommandError(RuntimeError):
+    def __init__(self, message: str, result: CommandResult | None = None):
+        super().__init__(message)
+        self.result = result
+
+
+class CommandTimeout(CommandError):
     pass
 
 
-def run_cmd(cmd: Sequence[str] | str, cwd: Path | None = None, env=None) -> str:
-    proc = subprocess.run(
+def _kill_group(proc: subprocess.Popen, grace: float = 5.0, reap: bool = False) -> None:
+    """
+    SIGTERM the whole process group (EvoSuite/Ant fork child JVMs), then SIGKILL.
+    `reap` also collects the direct child here; only when nobody else waits on it.
+    """
+    if os.name != "posix":
+        proc.kill()
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline:
+            if reap:
+                proc.poll()         # an unreaped zombie would keep the group alive
+            try:
+                os.killpg(proc.pid, 0)
+            except ProcessLookupError:
+                return
+            time.sleep(0.1)
+
+
+def run_command(cmd: Sequence[str] | str, cwd: Path | None = None, env=None,
+                timeout: float | None = None,
+                log_file: Path | None = None,
+                on_line: Callable[[str, str], None] | None = None,
+                tail_lines: int | None = None) -> CommandResult:
+    """
+    Run `cmd`, streaming its output line by line instead of buffering it.
+
+    * log_file   – every line is appended as it arrives (plus a header/footer)
+    * on_line    – callback(line, stream) with stream "stdout" or "stderr"
+    * tail_lines – keep only the last N lines per stream in memory (None = all)
+    * timeout    – wall-clock seconds; the whole process group is killed
+    """
+    log = None
+    if log_file is not None:
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        log = log_file.open("a", encoding="utf-8")
+        log.write(f"$ {cmd if isinstance(cmd, str) else ' '.join(map(str, cmd))}\n")
+        log.flush()
+    log_lock = threading.Lock()
+
+    slots = _cpu_slots
+    if slots is not None:
+        slots.acquire()
+    try:
+        return _run_streaming(cmd, cwd, env, timeout, log, log_lock, on_line, tail_lines)
+    finally:
+        if slots is not None:
+            slots.release()
+        if log is not None:
+            log.close()
+
+
+def _run_streaming(cmd, cwd, env, timeout, log, log_lock, on_line, tail_lines) -> CommandResult:
+    start = time.monotonic()
+    proc = subprocess.Popen(
         cmd, cwd=cwd, env=env, shell=isinstance(cmd, str),
-        text=True, capture_output=True
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, bufsize=1, errors="replace",
+        start_new_session=(os.name == "posix"),
     )
-    if proc.returncode != 0:
+    buffers = {"stdout": deque(maxlen=tail_lines), "stderr": deque(maxlen=tail_lines)}
+
+    def _pump(stream, name: str) -> None:
+        for line in stream:
+            buffers[name].append(line)
+            if log is not None:
+                with log_lock:
+                    log.write(line)
+                    log.flush()
+            if on_line is not None:
+                on_line(line.rstrip("\n"), name)
+        stream.close()
+
+    readers = [threading.Thread(target=_pump, args=(proc.stdout, "stdout"), daemon=True),
+               threading.Thread(target=_pump, args=(proc.stderr, "stderr"), daemon=True)]
+    for t in readers:
+        t.start()
+
+    timed_out = threading.Event()
+    timer = None
+    if timeout:
+        def _on_timeout() -> None:
+            timed_out.set()
+            _kill_group(proc)
+        timer = threading.Timer(timeout, _on_timeout)
+        timer.daemon = True
+        timer.start()
+
+    max_rss = 0
+    try:
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # covers what the child itself reaped too (Linux); string commands
+            # go through /bin/sh, so pass JVMs as argument lists to measure them
+            max_rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else:
+            proc.wait()
+    except BaseException:
+        # the child runs in its own session, so Ctrl-C never reaches it
+        _kill_group(proc, reap=True)
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+    for t in readers:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    result = CommandResult(cmd, proc.returncode, "".join(buffers["stdout"]),
+                           "".join(buffers["stderr"]), elapsed, max_rss,
+                           timed_out.is_set())
+    if log is not None:
+        log.write(f"# exit {result.returncode}, {elapsed:.1f}s, max RSS {max_rss} KB"
+                  f"{', TIMED OUT' if result.timed_out else ''}\n")
+    return result
+
+
+def run_cmd(cmd: Sequence[str] | str, cwd: Path | None = None, env=None,
+            timeout: float | None = None,
+            log_file: Path | None = None,
+            on_line: Callable[[str, str], None] | None = None,
+            tail_lines: int | None = None) -> str:
+    """`run_command`, raising CommandError/CommandTimeout on failure; returns stdout."""
+    res = run_command(cmd, cwd=cwd, env=env, timeout=timeout, log_file=log_file,
+                      on_line=on_line, tail_lines=tail_lines)
+    if res.timed_out:
+        raise CommandTimeout(
+            f"Command timed out after {timeout}s: {cmd}\n"
+            f"STDOUT (tail):\n{res.stdout}\nSTDERR (tail):\n{res.stderr}", res
+        )
+    if res.returncode != 0:
         raise CommandError(
-            f"Command failed (exit {proc.returncode}): {cmd}\n"
-            f"STDOUT:\n{proc.stdout}\nSTDERR:\n{proc.stderr}"
+            f"Command failed (exit {res.returncode}): {cmd}\n"
+            f"STDOUT:\n{res.stdout}\nSTDERR:\n{res.stderr}", res
         )
-    return proc.stdout
\ No newline at end of file
+    return res.stdout
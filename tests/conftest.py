@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import email.policy
+import json
+import random
+import re
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from TSGen.config import ProjectConfig  # noqa: E402
+
+
+class StubOpenAI(ThreadingHTTPServer):
+    """
+    Minimal OpenAI-compatible server on a free local port.
+
+    POST /v1/chat/completions answers "echo: <last user message>". Knobs:
+        rate_limited – answer this many upcoming requests with 429
+        retry_after  – Retry-After header sent with those 429s (None = none)
+        empty        – answer this many upcoming requests with empty content
+        delay        – each request sleeps uniformly in [0, delay] seconds
+    Every request body is kept in `chat_requests`; `max_in_flight` is the
+    highest number of requests handled at the same time.
+
+    The files/batches endpoints of the Batch API are served as well: a
+    batch completes on its `polls_to_complete`-th retrieve, answering each
+    request like a chat completion; requests whose custom_id contains
+    "FAIL" get a 400 in the error file.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.rate_limited = 0
+        self.retry_after: str | None = None
+        self.empty = 0
+        self.delay = 0.0
+        self.chat_requests: list[dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self.polls: dict[str, int] = {}
+        self.polls_to_complete = 2
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/v1"
+
+    @staticmethod
+    def reply_for(body: dict) -> str:
+        return "echo: " + body["messages"][-1]["content"]
+
+    def chat(self, body: dict) -> tuple[int, dict, dict]:
+        """(status, headers, payload) for one chat-completion request."""
+        with self.lock:
+            self.chat_requests.append(body)
+            if self.rate_limited > 0:
+                self.rate_limited -= 1
+                headers = {"retry-after": self.retry_after} if self.retry_after else {}
+                return 429, headers, {"error": {"message": "rate limited",
+                                                "type": "rate_limit_exceeded"}}
+            empty = self.empty > 0
+            self.empty -= empty
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(random.uniform(0, self.delay))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        return 200, {}, _completion("" if empty else self.reply_for(body))
+
+    # ── Batch API ────────────────────────────────────────────────────────
+    def upload(self, content_type: str, data: bytes) -> dict:
+        msg = BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + data)
+        content = next(part.get_payload(decode=True) for part in msg.iter_parts()
+                       if part.get_filename())
+        with self.lock:
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": 0,
+                "filename": "requests.jsonl", "purpose": "batch", "status": "processed"}
+
+    def create_batch(self, body: dict) -> dict:
+        with self.lock:
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": body["endpoint"],
+                "input_file_id": body["input_file_id"],
+                "completion_window": body["completion_window"], "status": "validating",
+                "created_at": 0, "output_file_id": None, "error_file_id": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            self.polls[batch_id] = 0
+            return self.batches[batch_id]
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        with self.lock:
+            batch = self.batches[batch_id]
+            self.polls[batch_id] += 1
+            if batch["status"] != "completed" and self.polls[batch_id] >= self.polls_to_complete:
+                self._complete(batch)
+            elif batch["status"] == "validating":
+                batch["status"] = "in_progress"
+            return batch
+
+    def _complete(self, batch: dict) -> None:
+        requests = [json.loads(line) for line in
+                    self.files[batch["input_file_id"]].decode().splitlines() if line]
+        out, err = [], []
+        for req in requests:
+            if "FAIL" in req["custom_id"]:
+                err.append({"id": "r", "custom_id": req["custom_id"], "error": None,
+                            "response": {"status_code": 400,
+                                         "body": {"error": {"message": "bad request"}}}})
+            else:
+                out.append({"id": "r", "custom_id": req["custom_id"], "error": None,
+                            "response": {"status_code": 200,
+                                         "body": _completion(self.reply_for(req["body"]))}})
+        for name, lines in (("output_file_id", out), ("error_file_id", err)):
+            if lines:
+                file_id = f"file-{len(self.files)}"
+                self.files[file_id] = "".join(json.dumps(l) + "\n" for l in lines).encode()
+                batch[name] = file_id
+        batch.update(status="completed", request_counts={
+            "total": len(requests), "completed": len(out), "failed": len(err)})
+
+
+def _completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "stub",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubOpenAI
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, payload: dict | bytes, headers: dict | None = None) -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/chat/completions"):
+            status, headers, payload = self.server.chat(json.loads(data))
+            return self._send(status, payload, headers)
+        if self.path.endswith("/files"):
+            return self._send(200, self.server.upload(self.headers["Content-Type"], data))
+        if self.path.endswith("/batches"):
+            return self._send(200, self.server.create_batch(json.loads(data)))
+        self._send(404, {"error": {"message": f"no route {self.path}"}})
+
+    def do_GET(self) -> None:
+        if m := re.search(r"/batches/([\w-]+)$", self.path):
+            return self._send(200, self.server.retrieve_batch(m.group(1)))
+        if m := re.search(r"/files/([\w-]+)/content$", self.path):
+            return self._send(200, self.server.files[m.group(1)])
+        self._send(404, {"error": {"message": f"no route {self.path}"}})
+
+
+@pytest.fixture
+def stub_openai(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    server = StubOpenAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cfg(tmp_path, stub_openai) -> ProjectConfig:
+    return ProjectConfig("demo", root_results=tmp_path, openai_base_url=stub_openai.base_url,
+                         llm_cache_mode="off", llm_backoff_base=0.01)
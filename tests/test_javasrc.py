@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import pytest
+
+from TSGen.javasrc import merge_chunks, parse_class
+
+ORIGINAL = """\
+package p;
+
+public class Foo_ESTest {
+    @Test
+    public void test0() { }
+
+    @Test
+    public void test1() { }
+}"""
+
+
+def _chunk(body: str) -> str:
+    return f"package p;\n\npublic class Foo_ESTest {{\n{body}\n}}"
+
+
+def test_merge_keeps_identical_helpers_once():
+    helper = "    private Foo make() { return new Foo(); }\n"
+    merged = merge_chunks(ORIGINAL, [_chunk(helper + "    @Test\n    public void test0() { make(); }"),
+                                     _chunk(helper + "    @Test\n    public void test1() { make(); }")])
+    assert merged.count("private Foo make()") == 1
+    assert [m.name for m in parse_class(merged).tests] == ["test0", "test1"]
+
+
+def test_merge_rejects_conflicting_helpers():
+    with pytest.raises(ValueError, match="make"):
+        merge_chunks(ORIGINAL, [
+            _chunk("    private Foo make() { return new Foo(); }\n    @Test\n    public void test0() { }"),
+            _chunk("    private Foo make() { return new Foo(1); }\n    @Test\n    public void test1() { }")])
+
+
+def test_merge_renames_conflicting_constants_outside_literals():
+    merged = merge_chunks(ORIGINAL, [
+        _chunk("    static final int N = 1;\n    @Test\n    public void test0() { use(N); }"),
+        _chunk("    static final int N = 2;\n    @Test\n"
+               "    public void test1() { assertEquals(\"N\", N); /* N */ }")])
+    assert "static final int N_2 = 2;" in merged
+    assert 'assertEquals("N", N_2); /* N */' in merged
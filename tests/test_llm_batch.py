@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import socket
+
+import openai
+import pytest
+
+from TSGen import llm_batch
+from TSGen.llm_batch import run_batch
+from TSGen.llm_client import LLMJob
+
+
+@pytest.fixture
+def batch_cfg(cfg):
+    return dataclasses.replace(cfg, llm_backend="batch", llm_batch_poll=0)
+
+
+def _jobs() -> list[LLMJob]:
+    return [LLMJob("a/A_ESTest.java", "system", "prompt A", {"max_completion_tokens": 5}),
+            LLMJob("b/FAIL_ESTest.java", "system", "prompt B"),
+            LLMJob("c/C_ESTest.java#1", "system", "prompt C")]
+
+
+def test_submit_poll_and_map_results(batch_cfg, stub_openai):
+    seen: list[str] = []
+    results = run_batch(batch_cfg, _jobs(), on_result=lambda job, reply: seen.append(job.key))
+
+    assert list(results) == seen == [job.key for job in _jobs()]
+    assert results["a/A_ESTest.java"] == "echo: prompt A"
+    assert results["c/C_ESTest.java#1"] == "echo: prompt C"
+    assert isinstance(results["b/FAIL_ESTest.java"], RuntimeError)
+    assert len(stub_openai.batches) == 1
+    assert stub_openai.polls["batch-0"] == stub_openai.polls_to_complete
+
+    uploaded = [json.loads(line) for line in stub_openai.files["file-0"].decode().splitlines()]
+    assert [r["custom_id"] for r in uploaded] == [job.key for job in _jobs()]
+    assert uploaded[0]["body"]["max_completion_tokens"] == 5
+    assert uploaded[0]["body"]["messages"][1]["content"] == "prompt A"
+
+
+def test_rerun_reattaches_to_the_submitted_batch(batch_cfg, stub_openai):
+    first = run_batch(batch_cfg, _jobs())
+    second = run_batch(batch_cfg, _jobs())
+    assert len(stub_openai.batches) == 1
+    assert second["a/A_ESTest.java"] == first["a/A_ESTest.java"]
+
+
+def test_cached_replies_skip_the_batch(batch_cfg, stub_openai):
+    cfg = dataclasses.replace(batch_cfg, llm_cache_mode="use")
+    jobs = [job for job in _jobs() if "FAIL" not in job.key]
+    run_batch(cfg, jobs)
+    results = run_batch(cfg, jobs)
+    assert len(stub_openai.batches) == 1
+    assert results["c/C_ESTest.java#1"] == "echo: prompt C"
+
+
+def test_unreachable_endpoint_gives_up(batch_cfg, monkeypatch):
+    with socket.socket() as s:                  # a port nobody listens on
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    cfg = dataclasses.replace(batch_cfg, openai_base_url=f"http://127.0.0.1:{port}/v1",
+                              llm_max_retries=2)
+    delays: list[float] = []
+    monkeypatch.setattr(llm_batch, "time", type("Clock", (), {"sleep": staticmethod(delays.append)}))
+    with pytest.raises(openai.APIConnectionError):
+        run_batch(cfg, _jobs())
+    assert len(delays) == 2
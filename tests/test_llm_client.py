@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import dataclasses
+import time
+import types
+
+import openai
+import pytest
+
+from TSGen import llm_client
+from TSGen.llm_client import LLMJob, complete, response_cache, run_jobs
+
+
+def _jobs(n: int) -> list[LLMJob]:
+    return [LLMJob(f"T{i}_ESTest.java", "system", f"prompt {i}") for i in range(n)]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays requested by the client (without actually sleeping)."""
+    delays: list[float] = []
+    clock = types.SimpleNamespace(**{name: getattr(time, name) for name in dir(time)
+                                     if not name.startswith("_")})
+    clock.sleep = delays.append
+    monkeypatch.setattr(llm_client, "time", clock)
+    return delays
+
+
+def test_retries_429_with_exponential_backoff(cfg, stub_openai, sleeps):
+    stub_openai.rate_limited = 3
+    assert complete(cfg, LLMJob("A", "system", "hello")) == "echo: hello"
+    assert len(stub_openai.chat_requests) == 4
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= cfg.llm_backoff_base * 2 ** attempt
+
+
+def test_retry_after_header_is_honoured(cfg, stub_openai, sleeps):
+    stub_openai.rate_limited, stub_openai.retry_after = 1, "0.25"
+    assert complete(cfg, LLMJob("A", "system", "hello")) == "echo: hello"
+    assert sleeps == [0.25]
+
+
+def test_gives_up_after_max_retries(cfg, stub_openai, sleeps):
+    cfg = dataclasses.replace(cfg, llm_max_retries=2)
+    stub_openai.rate_limited = 10
+    results = run_jobs(cfg, [LLMJob("A", "system", "hello")])
+    assert isinstance(results["A"], openai.RateLimitError)
+    assert len(stub_openai.chat_requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_empty_reply_is_retried_and_not_cached(cfg, stub_openai, sleeps):
+    cfg = dataclasses.replace(cfg, llm_cache_mode="use")
+    stub_openai.empty = 1
+    job = LLMJob("A", "system", "hello")
+    assert complete(cfg, job) == "echo: hello"
+    assert len(stub_openai.chat_requests) == 2
+    cache = response_cache(cfg)
+    assert cache.get(cache.key(cfg.openai_model, job.system, job.prompt, job.params)) == "echo: hello"
+
+
+def test_concurrency_is_bounded(cfg, stub_openai):
+    cfg = dataclasses.replace(cfg, llm_concurrency=3)
+    stub_openai.delay = 0.1
+    results = run_jobs(cfg, _jobs(12))
+    assert all(not isinstance(r, Exception) for r in results.values())
+    assert 1 < stub_openai.max_in_flight <= 3
+
+
+def test_concurrent_results_match_sequential_order(cfg, stub_openai):
+    jobs = _jobs(10)
+    stub_openai.delay = 0.05            # replies finish out of order
+    seen: list[str] = []
+    concurrent = run_jobs(dataclasses.replace(cfg, llm_concurrency=5), jobs,
+                          on_result=lambda job, reply: seen.append(job.key))
+    sequential = run_jobs(dataclasses.replace(cfg, llm_concurrency=1), jobs)
+    assert list(concurrent.items()) == list(sequential.items())
+    assert list(concurrent) == seen == [job.key for job in jobs]
+    assert concurrent["T3_ESTest.java"] == "echo: prompt 3"
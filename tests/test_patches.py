@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import pytest
+
+from TSGen.patches import Edit, PatchError, apply_edits, parse_edits
+
+SOURCE = """\
+public class Foo_ESTest {
+
+    @Test
+    public void test0() {
+        Foo foo = new Foo();
+        assertEquals(1, foo.bar());
+    }
+
+    @Test
+    public void test1() {
+        Foo foo = new Foo();
+        assertNull(foo.baz());
+    }
+}"""
+
+
+def _sr(search: str, replace: str) -> str:
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE\n"
+
+
+# ── parsing ─────────────────────────────────────────────────────────────
+def test_parse_search_replace_blocks_ignores_prose():
+    reply = "Here are the edits:\n" + _sr("a\nb", "c") + "and\n" + _sr("d", "")
+    assert parse_edits(reply) == [Edit(["a", "b"], ["c"]), Edit(["d"], [""])]
+
+
+def test_parse_unterminated_search_replace_block():
+    with pytest.raises(PatchError):
+        parse_edits("<<<<<<< SEARCH\na\n=======\nb\n")
+
+
+def test_parse_unified_diff_hunks():
+    diff = """```diff
+--- a/Foo_ESTest.java
++++ b/Foo_ESTest.java
+@@ -5,2 +5,2 @@
+         Foo foo = new Foo();
+-        assertEquals(1, foo.bar());
++        assertEquals("bar", 1, foo.bar());
+```"""
+    assert parse_edits(diff) == [Edit(
+        ["        Foo foo = new Foo();", "        assertEquals(1, foo.bar());"],
+        ["        Foo foo = new Foo();", '        assertEquals("bar", 1, foo.bar());'])]
+
+
+def test_parse_unified_diff_keeps_lines_that_look_like_headers():
+    diff = "@@ -1,2 +1,2 @@\n ctx\n--- i;\n+++ i;\n ctx2\n"
+    assert parse_edits(diff) == [Edit(["ctx", "-- i;", "ctx2"], ["ctx", "++ i;", "ctx2"])]
+
+
+def test_parse_unified_diff_stops_at_next_file_header():
+    diff = ("@@ -1 +1 @@\n-a\n+b\n"
+            "--- a/Other.java\n+++ b/Other.java\n@@ -1 +1 @@\n-c\n+d\n")
+    assert parse_edits(diff) == [Edit(["a"], ["b"]), Edit(["c"], ["d"])]
+
+
+# ── applying ────────────────────────────────────────────────────────────
+def test_apply_exact_match():
+    out = apply_edits(SOURCE, parse_edits(_sr("        assertNull(foo.baz());",
+                                              '        assertNull("baz", foo.baz());')))
+    assert '        assertNull("baz", foo.baz());' in out
+    assert out.count("\n") == SOURCE.count("\n")
+
+
+def test_apply_ignores_trailing_whitespace():
+    out = apply_edits(SOURCE, [Edit(["        assertNull(foo.baz());   "],
+                                    ["        assertNull(foo.qux());"])])
+    assert "        assertNull(foo.qux());" in out
+
+
+def test_apply_reindents_replacement():
+    edit = Edit(["assertEquals(1, foo.bar());"],
+                ["int expected = 1;", "assertEquals(expected, foo.bar());"])
+    out = apply_edits(SOURCE, [edit])
+    assert "        int expected = 1;\n        assertEquals(expected, foo.bar());" in out
+
+
+def test_apply_trims_blank_lines_from_search_and_replace_alike():
+    edit = Edit(["", "    @Test", "    public void test1() {", ""],
+                ["", "    @Test(timeout = 4000)", "    public void test1() {", ""])
+    out = apply_edits(SOURCE, [edit])
+    assert out == SOURCE.replace("    @Test\n    public void test1",
+                                 "    @Test(timeout = 4000)\n    public void test1")
+
+
+def test_apply_rejects_ambiguous_match():
+    with pytest.raises(PatchError, match="matches 2 places"):
+        apply_edits(SOURCE, [Edit(["        Foo foo = new Foo();"], ["x"])])
+
+
+def test_apply_rejects_missing_search_text():
+    with pytest.raises(PatchError, match="not found"):
+        apply_edits(SOURCE, [Edit(["        assertTrue(foo.isEmpty());"], ["x"])])
+
+
+def test_apply_rejects_blank_search():
+    with pytest.raises(PatchError, match="empty SEARCH"):
+        apply_edits(SOURCE, [Edit(["", "  "], ["x"])])